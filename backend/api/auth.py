@@ -9,7 +9,12 @@
 """
 import jwt
 import os
-from datetime import datetime, timedelta
+import time
+import json
+import base64
+import hashlib
+import threading
+import cachetools
 from typing import Optional
 
 from ninja import Router, Schema
@@ -24,6 +29,22 @@ JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRE_HOURS = 24 * 7  # Token 有效期 7 天
 
+# Token 解码缓存：同一个 Token 会被连续请求重复使用（流式、历史、轮询），
+# 缓存已验证的 payload 避免每次都做 HMAC 校验 + JSON 解析
+# key 用 blake2b 摘要，不直接存原始 Token
+# cachetools 的缓存不是线程安全的，认证热路径并发读写必须加锁
+_token_cache = cachetools.TTLCache(maxsize=10_000, ttl=30)
+# 无效 Token 单独缓存（短 TTL），避免被恶意 Token 反复打验证
+_bad_token_cache = cachetools.TTLCache(maxsize=10_000, ttl=5)
+_token_lock = threading.Lock()
+
+# 用户对象缓存：省掉每个认证请求的一次 User 查询 (流式对话会多次走认证)
+_user_cache = cachetools.TTLCache(maxsize=5000, ttl=60)
+_user_lock = threading.Lock()
+
+# 登录失败时用来做等时哈希校验的占位哈希 (防用户名枚举的时间侧信道)
+_DUMMY_PASSWORD_HASH = make_password("not-a-real-password")
+
 
 # ============ Schemas ============
 
@@ -53,27 +74,82 @@ class ErrorSchema(Schema):
 
 # ============ JWT Utils ============
 
+# 签名器和密钥只准备一次：jwt.encode 每次调用都会重新解析算法、重新 prepare key
+_signer = jwt.algorithms.HMACAlgorithm(jwt.algorithms.HMACAlgorithm.SHA256)
+_signing_key = _signer.prepare_key(JWT_SECRET)
+# header 固定不变，直接预编码好
+_JWT_HEADER_B64 = base64.urlsafe_b64encode(
+    json.dumps({"alg": JWT_ALGORITHM, "typ": "JWT"}, separators=(",", ":")).encode()
+).rstrip(b"=")
+
+
 def create_token(user_id: int) -> str:
-    """生成 JWT Token"""
+    """生成 JWT Token (使用预备好的签名密钥，产出与 jwt.encode 完全一致)"""
+    now = int(time.time())
     payload = {
         "user_id": user_id,
-        "exp": datetime.utcnow() + timedelta(hours=JWT_EXPIRE_HOURS),
-        "iat": datetime.utcnow(),
+        "exp": now + JWT_EXPIRE_HOURS * 3600,
+        "iat": now,
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    payload_b64 = base64.urlsafe_b64encode(
+        json.dumps(payload, separators=(",", ":")).encode()
+    ).rstrip(b"=")
+
+    signing_input = _JWT_HEADER_B64 + b"." + payload_b64
+    signature = _signer.sign(signing_input, _signing_key)
+    signature_b64 = base64.urlsafe_b64encode(signature).rstrip(b"=")
+
+    return (signing_input + b"." + signature_b64).decode()
 
 
 def decode_token(token: str) -> Optional[dict]:
-    """解码并验证 JWT Token"""
+    """解码并验证 JWT Token (带 TTL 缓存)"""
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    # 命中缓存：仍然检查 exp，防止缓存期间 Token 刚好过期
+    with _token_lock:
+        payload = _token_cache.get(cache_key)
+        if payload is not None:
+            if payload.get("exp", 0) > time.time():
+                return payload
+            _token_cache.pop(cache_key, None)
+            return None
+
+        if cache_key in _bad_token_cache:
+            return None
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        with _token_lock:
+            _token_cache[cache_key] = payload
         return payload
     except jwt.ExpiredSignatureError:
+        with _token_lock:
+            _bad_token_cache[cache_key] = None
         return None  # Token 过期
     except jwt.InvalidTokenError:
+        with _token_lock:
+            _bad_token_cache[cache_key] = None
         return None  # Token 无效
 
 
+def get_cached_user(user_id: int) -> Optional[User]:
+    """按 ID 查询用户 (带 60s 缓存，避免每个请求都打一次数据库)"""
+    with _user_lock:
+        user = _user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    try:
+        user = User.objects.get(id=user_id)
+    except User.DoesNotExist:
+        return None
+
+    with _user_lock:
+        _user_cache[user_id] = user
+    return user
+
+
 # ============ Auth Bearer ============
 
 class JWTAuth(HttpBearer):
@@ -86,13 +162,9 @@ class JWTAuth(HttpBearer):
         payload = decode_token(token)
         if payload is None:
             return None
-        
+
         user_id = payload.get("user_id")
-        try:
-            user = User.objects.get(id=user_id)
-            return user
-        except User.DoesNotExist:
-            return None
+        return get_cached_user(user_id)
 
 
 # ============ API Endpoints ============
@@ -136,6 +208,8 @@ def login(request, payload: LoginSchema):
     try:
         user = User.objects.get(username=payload.username)
     except User.DoesNotExist:
+        # 用户不存在时也跑一次哈希校验，避免响应时间暴露用户名是否存在
+        check_password(payload.password, _DUMMY_PASSWORD_HASH)
         return 401, {"detail": "用户名或密码错误"}
     
     # 验证密码
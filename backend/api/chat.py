@@ -3,45 +3,54 @@ from django.http import StreamingHttpResponse
 from django.contrib.auth.models import User
 from typing import List, Optional
 import json
+import orjson
+import cachetools
+import re
+import threading
 import uuid
 import time
+import numpy as np
 from datetime import datetime
+from django.db import connection, transaction, close_old_connections
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
 # LlamaIndex
-from llama_index.core import VectorStoreIndex, StorageContext, Settings
 from llama_index.core.llms import ChatMessage as LlamaChatMessage
-from llama_index.vector_stores.postgres import PGVectorStore
+from llama_index.core.schema import QueryBundle
 from llama_index.core.tools import QueryEngineTool, ToolMetadata
 from llama_index.core.query_engine import RouterQueryEngine
 from llama_index.core.selectors import EmbeddingSingleSelector
 
 # Local Imports
 from chat.models import ChatSession, ChatMessage
-from documents.services import get_vector_store, init_llm, init_embedding
-from core.mcp_tools import get_mcp_tools, get_tool_server_map
-from api.auth import decode_token  # 导入 JWT 解码函数
+from documents.services import get_retriever, init_llm, init_embedding
+from core.mcp_tools import get_mcp_tools, get_tool_server_map, get_mcp_tools_version
+from api.auth import decode_token, get_cached_user  # 导入 JWT 解码/用户缓存函数
 
 router = Router(tags=["Chat"])
 
 
+# Bearer 前缀常量，配合 META 直读避免每次构造 headers 映射
+_BEARER_PREFIX = "Bearer "
+_BEARER_LEN = len(_BEARER_PREFIX)
+
+
 def get_current_user_from_request(request) -> Optional[User]:
     """
     从请求的 Authorization header 中提取并验证用户
     这是一个可选的认证 - 如果没有 Token 或 Token 无效，返回 None
     """
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
+    # 直接读 META，绕开 request.headers 的惰性字典封装
+    auth_header = request.META.get("HTTP_AUTHORIZATION", "")
+    if not auth_header.startswith(_BEARER_PREFIX):
         return None
-    
-    token = auth_header[7:]  # 去掉 "Bearer " 前缀
-    payload = decode_token(token)
+
+    payload = decode_token(auth_header[_BEARER_LEN:])
     if payload is None:
         return None
-    
+
     user_id = payload.get("user_id")
-    try:
-        return User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        return None
+    return get_cached_user(user_id)
 
 # --- Schemas ---
 class MessageSchema(Schema):
@@ -68,6 +77,106 @@ class SessionSchema(Schema):
 
 # --- Core Logic ---
 
+# 中文字符匹配 (关键词拆分用)，预编译避免每次查 re 缓存
+_ZH_RE = re.compile(r'[\u4e00-\u9fa5]')
+
+# 查询 embedding 小缓存：同一句话重复出现 (重试、常见问法) 时直接复用，
+# embedding 对固定模型是确定性的，不需要 TTL。
+# cachetools 缓存非线程安全，路由阶段跑在线程池里，读写都要加锁
+_query_emb_cache = cachetools.LRUCache(maxsize=512)
+_query_emb_lock = threading.Lock()
+
+def _get_query_embedding(embed_model, text: str):
+    with _query_emb_lock:
+        vec = _query_emb_cache.get(text)
+    if vec is None:
+        # 必须用 get_query_embedding：BGE 中文模型会给查询加检索指令前缀，
+        # 换成 get_text_embedding 会悄悄改变检索分数的分布，
+        # VECTOR_THRESHOLD / RAG_THRESHOLD 都是按查询前缀标定的
+        vec = embed_model.get_query_embedding(text)
+        with _query_emb_lock:
+            _query_emb_cache[text] = vec
+    return vec
+
+# 工具描述 embedding 缓存：工具描述不随请求变化，
+# 预计算并归一化成矩阵，工具匹配就变成一次矩阵乘法
+_tool_emb_cache = {"version": None, "matrix": None, "names": []}
+
+def _get_tool_embeddings(mcp_tools, embed_model):
+    """获取 (归一化的工具 embedding 矩阵, 工具名列表)，按 MCP 工具集版本缓存"""
+    version = get_mcp_tools_version()
+    if _tool_emb_cache["version"] != version:
+        matrix = np.stack([
+            np.asarray(
+                embed_model.get_text_embedding(f"{tool.metadata.name}: {tool.metadata.description or ''}"),
+                dtype=np.float32
+            )
+            for tool in mcp_tools
+        ])
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        _tool_emb_cache["matrix"] = matrix
+        _tool_emb_cache["names"] = [tool.metadata.name for tool in mcp_tools]
+        _tool_emb_cache["version"] = version
+    return _tool_emb_cache["matrix"], _tool_emb_cache["names"]
+
+
+# 流式输出缓冲参数：LLM 的 delta 往往只有 1-5 个字符，
+# 每个都单独序列化 + flush 会被 write 系统调用开销支配
+_STREAM_FLUSH_CHARS = 32   # 攒够这么多字符就输出一帧
+_STREAM_FLUSH_SECS = 0.05  # 或者距离上次输出超过 50ms
+
+async def _stream_llm_frames(response_stream):
+    """把 LLM 分片攒成较大的帧再输出，yield (累计文本, 序列化好的帧)"""
+    buf = []
+    buf_len = 0
+    last_flush = time.monotonic()
+    async for chunk in response_stream:
+        if not chunk.delta:
+            continue
+        buf.append(chunk.delta)
+        buf_len += len(chunk.delta)
+        now = time.monotonic()
+        if buf_len >= _STREAM_FLUSH_CHARS or now - last_flush > _STREAM_FLUSH_SECS:
+            text = "".join(buf)
+            yield text, orjson.dumps({"text": text}) + b"\n"
+            buf = []
+            buf_len = 0
+            last_flush = now
+    if buf:
+        text = "".join(buf)
+        yield text, orjson.dumps({"text": text}) + b"\n"
+
+
+
+def _tool_result_is_plain(text: str) -> bool:
+    """工具返回是否已是可直接展示的短文本 (非 JSON/XML 且长度适中)"""
+    stripped = text.strip()
+    if not stripped or len(stripped) > 300:
+        return False
+    return not stripped.startswith(("{", "[", "<"))
+
+
+# 落库线程池：AI 回复写库不需要阻塞流式响应的收尾
+_persist_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chat-persist")
+
+def _persist_ai_message(session_id: str, content: str, sources: list, elapsed_time: int, user_message: str):
+    """后台线程中单事务写入 AI 回复，并在会话还叫 New Chat 时补标题"""
+    try:
+        close_old_connections()
+        new_title = user_message.strip()[:20] + ("..." if len(user_message) > 20 else "")
+        with transaction.atomic():
+            ChatMessage.objects.create(
+                session_id=session_id,
+                role='ai',
+                content=content,
+                sources=sources,
+                elapsed_time=elapsed_time
+            )
+            # 条件 UPDATE 代替 get + save，避免读改写竞态，也少一次往返
+            ChatSession.objects.filter(id=session_id, title="New Chat").update(title=new_title)
+    except Exception as e:
+        print(f"Persist error: {e}")
+
 def get_chat_history(session_id: str) -> List[LlamaChatMessage]:
     """从数据库加载历史记录"""
     if not session_id:
@@ -88,31 +197,40 @@ def get_chat_history(session_id: str) -> List[LlamaChatMessage]:
         history.append(LlamaChatMessage(role=role, content=msg.content))
     return history
 
-def stream_generator(current_message: str, history: List[LlamaChatMessage], model_name: str, use_rag: bool, session_id: str):
+def _route_request(current_message: str, use_rag: bool) -> dict:
     """
-    流式生成器函数: MCP 工具 / 混合检索 -> 决定 Tool/RAG/Chat -> Stream
+    同步的路由准备阶段: 初始化模型 / 向量检索 / 关键词匹配 / 工具匹配
+    整段在线程池里跑 (sync_to_async)，返回流式阶段需要的所有状态
     """
-    start_time = time.time() # 开始计时
+    # llm / embed_model 全程显式传递，不写全局 Settings (多线程下会互相覆盖)
     llm = init_llm()
     embed_model = init_embedding()
-    Settings.llm = llm
-    Settings.embed_model = embed_model
-    
+
     # --- 0. 加载 MCP 工具 ---
     mcp_tools = get_mcp_tools()
     if mcp_tools:
         print(f"🔧 已加载 {len(mcp_tools)} 个 MCP 工具")
     
+    # --- 0.5 查询 embedding 只算一次，RAG 检索和工具匹配共用 ---
+    query_embedding = None
+    if embed_model and (use_rag or mcp_tools):
+        try:
+            query_embedding = _get_query_embedding(embed_model, current_message)
+        except Exception as e:
+            print(f"Query embedding error: {e}")
+
     # --- 1. 向量检索 ---
     retrieved_nodes = []
     max_score = 0.0
-    
+
     if use_rag:
         try:
-            vector_store = get_vector_store()
-            index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
-            retriever = index.as_retriever(similarity_top_k=3)
-            retrieved_nodes = retriever.retrieve(current_message)
+            # 检索器是全局单例，不再每条消息重建索引对象
+            retriever = get_retriever(similarity_top_k=3)
+            # 传入预计算的 embedding，避免 LlamaIndex 在检索内部再算一次
+            retrieved_nodes = retriever.retrieve(
+                QueryBundle(query_str=current_message, embedding=query_embedding)
+            )
             
             if retrieved_nodes:
                 max_score = max(node.score for node in retrieved_nodes if node.score is not None)
@@ -128,10 +246,11 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
     keyword_results = []
     is_exact_match = False  # 标记是否精确匹配
     
-    if current_message.strip() and len(current_message.strip()) > 2:
+    # 向量检索分数已经够高时跳过关键词扫描 (全表 ILIKE 不便宜)
+    need_keyword_search = use_rag and max_score < VECTOR_THRESHOLD
+
+    if need_keyword_search and current_message.strip() and len(current_message.strip()) > 2:
         try:
-            from django.db import connection
-            import re
             query_text = current_message.strip()
             
             # 方法1：精确匹配整个查询
@@ -147,7 +266,7 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
                     print(f"Keyword Match (exact): found {len(rows)} documents")
                 else:
                     # 方法2：如果精确匹配失败，尝试拆分关键词匹配
-                    chinese_chars = re.findall(r'[\u4e00-\u9fa5]', query_text)
+                    chinese_chars = _ZH_RE.findall(query_text)
                     chinese_str = ''.join(chinese_chars)
                     
                     if len(chinese_str) >= 4:
@@ -178,41 +297,42 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
     # 优先级：RAG > 工具 > 普通对话
     # 使用向量语义匹配来判断是否需要工具
     
+    # 决策阈值
+    TOOL_THRESHOLD = 0.4  # 工具匹配阈值，降低以更容易触发
+    RAG_THRESHOLD = 0.5   # RAG 阈值
+
+    # 先算 RAG 分数：精确命中知识库时可以直接跳过工具匹配
+    rag_score = max_score if max_score >= RAG_THRESHOLD or (keyword_match and max_score >= 0.3) else 0
+
     # 计算用户问题和工具描述的相似度
     tool_match_score = 0.0
     matched_tool_name = None
-    
-    if mcp_tools and embed_model:
+
+    # 没有工具、或知识库已精确命中且 RAG 分数有效时，省掉工具匹配。
+    # 注意精确命中只会发生在 max_score < VECTOR_THRESHOLD 的分支里，
+    # 此时 rag_score 最多 0.5，所以条件只能看 rag_score > 0；
+    # 代价是个别"原文精确命中但其实该调工具"的问题会被路由去 RAG，接受
+    skip_tool_match = not mcp_tools or (is_exact_match and rag_score > 0)
+
+    if mcp_tools and embed_model and query_embedding is not None and not skip_tool_match:
         try:
-            # 把用户问题做成 embedding
-            query_embedding = embed_model.get_text_embedding(current_message)
-            
-            # 计算和每个工具描述的相似度
-            for tool in mcp_tools:
-                tool_desc = f"{tool.metadata.name}: {tool.metadata.description or ''}"
-                tool_embedding = embed_model.get_text_embedding(tool_desc)
-                
-                # 计算余弦相似度
-                import numpy as np
-                similarity = np.dot(query_embedding, tool_embedding) / (
-                    np.linalg.norm(query_embedding) * np.linalg.norm(tool_embedding)
-                )
-                
-                if similarity > tool_match_score:
-                    tool_match_score = similarity
-                    matched_tool_name = tool.metadata.name
-            
+            # 工具 embedding 已预计算，查询 embedding 复用上面算好的那份
+            tool_matrix, tool_names = _get_tool_embeddings(mcp_tools, embed_model)
+            query_vec = np.asarray(query_embedding, dtype=np.float32)
+            query_vec /= np.linalg.norm(query_vec)
+
+            # 一次矩阵乘法得到所有工具的余弦相似度
+            similarities = tool_matrix @ query_vec
+            best_idx = int(np.argmax(similarities))
+            tool_match_score = float(similarities[best_idx])
+            matched_tool_name = tool_names[best_idx]
+
             print(f"Tool Match: max_score={tool_match_score:.3f}, tool={matched_tool_name}")
         except Exception as e:
             print(f"Tool matching error: {e}")
     
-    # 决策阈值
-    TOOL_THRESHOLD = 0.4  # 工具匹配阈值，降低以更容易触发
-    RAG_THRESHOLD = 0.5   # RAG 阈值
-    
     # 决策逻辑：比较分数，选更高的
     # 如果都低于阈值 → 普通对话
-    rag_score = max_score if max_score >= RAG_THRESHOLD or (keyword_match and max_score >= 0.3) else 0
     tool_score = tool_match_score if tool_match_score >= TOOL_THRESHOLD else 0
     
     if rag_score > 0 and rag_score >= tool_score:
@@ -223,9 +343,43 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
         selected_mode = "chat"
     
     print(f"Router Decision: {selected_mode} (rag={rag_score:.3f}, tool={tool_score:.3f})")
-    
+
+    return {
+        "llm": llm,
+        "mcp_tools": mcp_tools,
+        "selected_mode": selected_mode,
+        "matched_tool_name": matched_tool_name,
+        "retrieved_nodes": retrieved_nodes,
+        "keyword_match": keyword_match,
+        "keyword_results": keyword_results,
+        "is_exact_match": is_exact_match,
+    }
+
+
+async def stream_generator(current_message: str, history: List[LlamaChatMessage], model_name: str, use_rag: bool, session_id: str):
+    """
+    流式生成器函数: MCP 工具 / 混合检索 -> 决定 Tool/RAG/Chat -> Stream
+    异步版本：路由准备在线程池执行，LLM 流式用 astream_chat，
+    整个请求只占用一个协程而不是一个 worker 线程
+    """
+    start_time = time.time() # 开始计时
+    # 时间字符串整个请求用同一份，不在各分支里重复 strftime
+    current_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # 路由准备阶段是同步代码 (ORM / 向量检索 / 关键词 SQL)，放线程池跑
+    route = await sync_to_async(_route_request, thread_sensitive=False)(current_message, use_rag)
+    llm = route["llm"]
+    mcp_tools = route["mcp_tools"]
+    selected_mode = route["selected_mode"]
+    matched_tool_name = route["matched_tool_name"]
+    retrieved_nodes = route["retrieved_nodes"]
+    keyword_match = route["keyword_match"]
+    keyword_results = route["keyword_results"]
+    is_exact_match = route["is_exact_match"]
+
     full_response_text = ""
     sources = []
+    seen_sources = set()  # (file_name, page) 去重键，避免对 sources 列表线性扫描
 
     try:
         # 1. RAG 分支（知识库问答）
@@ -235,15 +389,16 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
             if keyword_match and keyword_results:
                 rag_texts = [row[0] for row in keyword_results]
                 rag_context = "\n\n参考资料:\n" + "\n---\n".join(rag_texts)
-                import json as json_lib
                 for row in keyword_results:
                     try:
                         raw_meta = row[1]
-                        meta = json_lib.loads(raw_meta) if isinstance(raw_meta, str) else (raw_meta if isinstance(raw_meta, dict) else {})
+                        meta = json.loads(raw_meta) if isinstance(raw_meta, str) else (raw_meta if isinstance(raw_meta, dict) else {})
                         file_name = meta.get("file_name") or meta.get("title") or "未知文件"
                         if "/" in str(file_name): file_name = str(file_name).split("/")[-1]
-                        source_info = {"file_name": file_name, "page": meta.get("page_label")}
-                        if source_info not in sources: sources.append(source_info)
+                        source_key = (file_name, meta.get("page_label"))
+                        if source_key not in seen_sources:
+                            seen_sources.add(source_key)
+                            sources.append({"file_name": file_name, "page": meta.get("page_label")})
                     except: pass
             else:
                 rag_texts = [n.get_content() for n in retrieved_nodes]
@@ -252,11 +407,10 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
                     meta = node.node.metadata if hasattr(node.node, 'metadata') else {}
                     file_name = meta.get("file_name") or "未知文件"
                     if "/" in str(file_name): file_name = str(file_name).split("/")[-1]
-                    source_info = {"file_name": file_name, "page": meta.get("page_label")}
-                    if source_info not in sources: sources.append(source_info)
-            
-            import datetime
-            current_time_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    source_key = (file_name, meta.get("page_label"))
+                    if source_key not in seen_sources:
+                        seen_sources.add(source_key)
+                        sources.append({"file_name": file_name, "page": meta.get("page_label")})
             
             # 获取唯一的文档来源
             unique_files = list(set([s.get("file_name", "未知") for s in sources]))
@@ -284,11 +438,10 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
             messages.extend(history)
             messages.append(LlamaChatMessage(role="user", content=f"{current_message}\n{rag_context}"))
             
-            response_stream = llm.stream_chat(messages)
-            for chunk in response_stream:
-                if chunk.delta:
-                    full_response_text += chunk.delta
-                    yield json.dumps({"text": chunk.delta}, ensure_ascii=False) + "\n"
+            response_stream = await llm.astream_chat(messages)
+            async for text, frame in _stream_llm_frames(response_stream):
+                full_response_text += text
+                yield frame
         
         # 2. 工具分支
         elif selected_mode == "tool":
@@ -302,8 +455,8 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
                 )
                 tool_history = [system_msg] + list(history)
                 
-                # 使用 LLM function calling
-                response = llm.chat_with_tools(
+                # 使用 LLM function calling (同步接口，放线程池)
+                response = await sync_to_async(llm.chat_with_tools, thread_sensitive=False)(
                     tools=mcp_tools,
                     user_msg=current_message,
                     chat_history=tool_history,
@@ -318,6 +471,8 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
                 if tool_calls:
                     # 执行工具调用
                     tool_results = []
+                    raw_outputs = []      # 不带工具名前缀的原始返回，供直接输出
+                    had_tool_error = False
                     for tc in tool_calls:
                         print(f"🔧 调用工具: {tc.tool_name}({tc.tool_kwargs})")
 
@@ -336,33 +491,40 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
                         for tool in mcp_tools:
                             if tool.metadata.name == tc.tool_name:
                                 try:
-                                    result = tool.call(**tc.tool_kwargs)
+                                    result = await sync_to_async(tool.call, thread_sensitive=False)(**tc.tool_kwargs)
                                     tool_results.append(f"{tc.tool_name}: {result}")
+                                    raw_outputs.append(str(result))
                                 except Exception as te:
                                     tool_results.append(f"{tc.tool_name} 失败: {te}")
+                                    had_tool_error = True
                                 break
                     
                     # 用工具结果生成回答
                     tool_context = "\n".join(tool_results)
-                    import datetime
-                    current_time_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    messages = [
-                        LlamaChatMessage(role="system", content=f"你是助手。当前时间是: {current_time_str}。根据工具返回的信息回答用户。"),
-                        LlamaChatMessage(role="user", content=current_message),
-                        LlamaChatMessage(role="assistant", content=f"工具返回:\n{tool_context}"),
-                        LlamaChatMessage(role="user", content="请用这些信息回答我。")
-                    ]
-                    response_stream = llm.stream_chat(messages)
-                    for chunk in response_stream:
-                        if chunk.delta:
-                            full_response_text += chunk.delta
-                            yield json.dumps({"text": chunk.delta}, ensure_ascii=False) + "\n"
+                    raw_output = "\n".join(raw_outputs)
+
+                    if not had_tool_error and _tool_result_is_plain(raw_output):
+                        # 工具返回已经是人类可读的短文本，直接输出，
+                        # 省掉第二次 LLM 往返 (工具路径延迟的大头)
+                        print("  → Tool: 结果为短文本，直接输出")
+                        full_response_text = raw_output
+                        yield orjson.dumps({"text": raw_output}) + b"\n"
+                    else:
+                        messages = [
+                            LlamaChatMessage(role="system", content=f"你是助手。当前时间是: {current_time_str}。根据工具返回的信息回答用户。"),
+                            LlamaChatMessage(role="user", content=current_message),
+                            LlamaChatMessage(role="assistant", content=f"工具返回:\n{tool_context}"),
+                            LlamaChatMessage(role="user", content="请用这些信息回答我。")
+                        ]
+                        response_stream = await llm.astream_chat(messages)
+                        async for text, frame in _stream_llm_frames(response_stream):
+                            full_response_text += text
+                            yield frame
                 else:
                     # LLM 判断不需要工具
                     full_response_text = str(response.message.content)
                     for i in range(0, len(full_response_text), 50):
-                        yield json.dumps({"text": full_response_text[i:i+50]}, ensure_ascii=False) + "\n"
+                        yield orjson.dumps({"text": full_response_text[i:i+50]}) + b"\n"
                         
             except Exception as e:
                 print(f"Tool error: {e}")
@@ -370,85 +532,74 @@ def stream_generator(current_message: str, history: List[LlamaChatMessage], mode
                 messages = [LlamaChatMessage(role="system", content="你是助手。")]
                 messages.extend(history)
                 messages.append(LlamaChatMessage(role="user", content=current_message))
-                response_stream = llm.stream_chat(messages)
-                for chunk in response_stream:
-                    if chunk.delta:
-                        full_response_text += chunk.delta
-                        yield json.dumps({"text": chunk.delta}, ensure_ascii=False) + "\n"
+                response_stream = await llm.astream_chat(messages)
+                async for text, frame in _stream_llm_frames(response_stream):
+                    full_response_text += text
+                    yield frame
         
         # 3. 普通对话（最快）
         else:
             print("Router Decision: chat")
-            import datetime
-            current_time_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             system_prompt = f"你是一个友好的 AI 助手。当前时间是: {current_time_str}。"
             messages = [LlamaChatMessage(role="system", content=system_prompt)]
             messages.extend(history)
             messages.append(LlamaChatMessage(role="user", content=current_message))
             
-            response_stream = llm.stream_chat(messages)
-            for chunk in response_stream:
-                if chunk.delta:
-                    full_response_text += chunk.delta
-                    yield json.dumps({"text": chunk.delta}, ensure_ascii=False) + "\n"
+            response_stream = await llm.astream_chat(messages)
+            async for text, frame in _stream_llm_frames(response_stream):
+                full_response_text += text
+                yield frame
 
         # 发送 Sources 和保存
         if sources:
-            yield json.dumps({"sources": sources}, ensure_ascii=False) + "\n"
+            # sources 只序列化一次，帧的外壳直接拼 bytes
+            yield b'{"sources":' + orjson.dumps(sources) + b"}\n"
         
         if session_id:
-            try:
-                session = ChatSession.objects.get(id=session_id)
-                elapsed_time = int((time.time() - start_time) * 1000) # 计算耗时 (ms)
-                ChatMessage.objects.create(
-                    session=session, 
-                    role='ai', 
-                    content=full_response_text, 
-                    sources=sources,
-                    elapsed_time=elapsed_time
-                )
-                if session.title == "New Chat":
-                    session.title = current_message.strip()[:20] + ("..." if len(current_message) > 20 else "")
-                    session.save(update_fields=['title'])
-            except: pass
+            # 写库放到后台线程，流式响应立刻收尾归还 worker
+            elapsed_time = int((time.time() - start_time) * 1000) # 计算耗时 (ms)
+            _persist_pool.submit(
+                _persist_ai_message,
+                session_id, full_response_text, sources, elapsed_time, current_message
+            )
 
     except Exception as e:
-        yield json.dumps({"text": f"Error: {str(e)}"}, ensure_ascii=False) + "\n"
+        yield orjson.dumps({"text": f"Error: {str(e)}"}) + b"\n"
 
 
 
 @router.post("/stream", summary="流式对话 (带记忆)")
-def chat_stream(request, payload: ChatRequest):
+async def chat_stream(request, payload: ChatRequest):
     # 1. 获取或创建 Session
     from django.core.exceptions import ValidationError
-    
+
     session_id = payload.session_id
     session = None
-    
-    # 获取当前用户（如果已认证）
-    current_user = get_current_user_from_request(request)
-    
+
+    # 获取当前用户（如果已认证）- 内部有同步 DB 查询，放线程池
+    current_user = await sync_to_async(get_current_user_from_request, thread_sensitive=False)(request)
+
     if session_id:
         try:
             # 尝试获取现有 Session
-            session = ChatSession.objects.get(id=session_id)
-            # 如果会话没有用户但当前用户已登录，关联用户
-            if not session.user and current_user:
+            session = await ChatSession.objects.aget(id=session_id)
+            # 如果会话没有用户但当前用户已登录，关联用户 (user_id 避免触发惰性外键查询)
+            if not session.user_id and current_user:
                 session.user = current_user
-                session.save(update_fields=['user'])
+                await session.asave(update_fields=['user'])
         except (ChatSession.DoesNotExist, ValidationError):
             # 如果不存在 或 格式不对，我们就尝试新建
             try:
                 # 尝试用传来的 session_id 创建可能会再次失败（如果格式不对）
                 uuid.UUID(session_id) # 验证一下格式
-                session = ChatSession.objects.create(id=session_id, user=current_user)
+                session = await ChatSession.objects.acreate(id=session_id, user=current_user)
             except (ValueError, ValidationError):
                 # 彻底放弃原来的 ID，生成新的
-                session = ChatSession.objects.create(user=current_user)
+                session = await ChatSession.objects.acreate(user=current_user)
                 session_id = str(session.id)
     else:
         # 如果前端没传 ID，我们新建一个
-        session = ChatSession.objects.create(user=current_user)
+        session = await ChatSession.objects.acreate(user=current_user)
         session_id = str(session.id)
 
     # 2. 获取用户最新的一条消息
@@ -462,7 +613,7 @@ def chat_stream(request, payload: ChatRequest):
         return {"error": "No user message found"}
 
     # 3. 保存用户消息到数据库
-    ChatMessage.objects.create(
+    await ChatMessage.objects.acreate(
         session=session,
         role='user',
         content=user_text
@@ -470,7 +621,7 @@ def chat_stream(request, payload: ChatRequest):
 
     # 4. 加载历史记录 (不包含刚刚存的这条，因为要作为 prompt 单独传)
     # LlamaIndex stream_chat(message, history) 里的 history 指的是 "Previous conversation"
-    history = get_chat_history(session_id)
+    history = await sync_to_async(get_chat_history, thread_sensitive=False)(session_id)
     # 去掉刚刚存的那条 user message，防止重复 (因为 get_chat_history 会取所有)
     if history and history[-1].role == "user" and history[-1].content == user_text:
         history.pop()
@@ -499,13 +650,16 @@ def get_history(request, session_id: str):
         if session and session.user and current_user and session.user != current_user:
             return []  # 无权访问其他用户的会话
         
-        messages = ChatMessage.objects.filter(session_id=session_id).order_by('created_at')
+        # values() 直接拿 dict，不实例化 ORM 对象 (长历史时省一半内存和序列化开销)
+        messages = ChatMessage.objects.filter(
+            session_id=session_id
+        ).order_by('created_at').values('role', 'content', 'sources', 'elapsed_time')
         return [
             {
-                "role": msg.role, 
-                "text": msg.content if msg.content else "",
-                "sources": msg.sources,
-                "elapsed": msg.elapsed_time
+                "role": msg['role'],
+                "text": msg['content'] if msg['content'] else "",
+                "sources": msg['sources'],
+                "elapsed": msg['elapsed_time']
             }
             for msg in messages
         ]
@@ -548,22 +702,25 @@ def get_sessions(request):
     
     # 只返回当前用户的会话（如果已登录）或匿名会话
     if current_user:
+        # values() 跳过模型实例化，只取列表需要的几列
         sessions = ChatSession.objects.filter(
             is_active=True,
             user=current_user
         ).annotate(
             message_count=Count('messages')
-        ).order_by('-updated_at')[:20]
+        ).order_by('-updated_at').values(
+            'id', 'title', 'updated_at', 'message_count'
+        )[:20]
     else:
         # 未登录用户看不到任何会话
         return []
-    
+
     return [
         {
-            "id": str(session.id),
-            "title": session.title,
-            "updated_at": session.updated_at.isoformat(),
-            "message_count": session.message_count
+            "id": str(session['id']),
+            "title": session['title'],
+            "updated_at": session['updated_at'].isoformat(),
+            "message_count": session['message_count']
         }
         for session in sessions
     ]
@@ -1,7 +1,7 @@
 from ninja import Router, UploadedFile, File
 from ninja.errors import HttpError
 from documents.models import Document
-from documents.services import index_document
+from documents.services import submit_index
 from django.conf import settings
 import os
 import shutil
@@ -26,24 +26,16 @@ def upload_document(request, file: UploadedFile = File(...)):
         file=file  # Ninja 的 UploadedFile 兼容 Django FileField
     )
     
-    # 3. 触发索引 (同步或异步)
-    # 在生产环境中，这里应该使用 Celery 异步任务
-    # 开发环境下为了方便验证，我们先用同步调用
-    success = index_document(doc.id)
-    
-    if not success:
-        # 重新获取最新的状态信息（包含错误消息）
-        doc.refresh_from_db()
-        return {
-            "success": False,
-            "message": "文档上传成功但索引失败",
-            "document_id": doc.id,
-            "error": doc.error_message
-        }
+    # 3. 触发后台索引：入队即返回，解析和 embedding 在常驻线程池里执行，
+    # 上传请求不再阻塞在几十秒的索引流程上。索引进度可查询文档状态接口
+    doc.status = Document.Status.PROCESSING
+    doc.save(update_fields=['status'])
+    submit_index(doc.id)
 
     return {
         "success": True,
-        "message": "文档上传并索引成功",
+        "message": "文档上传成功，索引任务已入队",
         "document_id": doc.id,
-        "title": doc.title
+        "title": doc.title,
+        "status": doc.status,
     }
@@ -6,17 +6,41 @@ STT API - 语音识别接口
 
 import asyncio
 import json
-import base64
+from functools import lru_cache
+
+# pybase64 带 SIMD 实现，多 MB 音频上比标准库快好几倍；没装就退回标准库
+try:
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+
 from ninja import Router
 from django.http import JsonResponse
 from pydantic import BaseModel
 import websockets
 
+from core.aioloop import run
+
 router = Router(tags=["STT"])
 
 # FunASR 服务地址（通过 frp 穿透）
 FUNASR_WS_URL = "ws://117.72.92.10:8889"
 
+# 协议帧预序列化：结束消息是常量，开始消息只有格式/采样率两个变量，按参数缓存
+_END_MSG = json.dumps({"is_speaking": False})
+
+
+@lru_cache(maxsize=16)
+def _start_msg(audio_format: str, sample_rate: int) -> str:
+    return json.dumps({
+        "mode": "offline",  # 离线模式，一次性发送完整音频
+        "chunk_size": [5, 10, 5],
+        "wav_name": "audio",
+        "is_speaking": True,
+        "wav_format": audio_format,
+        "audio_fs": sample_rate
+    })
+
 
 class STTRequest(BaseModel):
     """STT 请求体"""
@@ -25,14 +49,102 @@ class STTRequest(BaseModel):
     sample_rate: int = 16000  # 采样率
 
 
-class STTResponse(BaseModel):
-    """STT 响应体"""
-    success: bool
-    text: str = ""
-    error: str = ""
+class FunASRClient:
+    """
+    FunASR WebSocket 持久连接客户端
+    连接建立一次后跨请求复用 (活在共享后台事件循环上)，断线自动重连。
+    frp 穿透链路上握手 RTT 比识别本身还贵，每个请求都重新 connect 划不来。
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._ws = None
+        self._lock = asyncio.Lock()  # 离线识别是请求-应答式的，串行化同一条连接
+
+    async def _ensure(self):
+        """确保连接可用，必要时建立"""
+        if self._ws is None:
+            self._ws = await websockets.connect(
+                self.url,
+                open_timeout=10,
+                close_timeout=5,
+                ping_interval=20,
+                ping_timeout=10,
+                max_size=None,
+                compression=None,
+            )
+        return self._ws
+
+    async def _reset(self):
+        """丢弃当前连接，下次使用时重建"""
+        if self._ws is not None:
+            try:
+                await self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+
+    async def recognize(self, audio_data: bytes, audio_format: str, sample_rate: int) -> str:
+        """识别一段音频；连接已失效时重连并重试一次"""
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    ws = await self._ensure()
+
+                    # 发送开始消息 (预序列化)
+                    await ws.send(_start_msg(audio_format, sample_rate))
+
+                    # 发送音频数据 (memoryview 让帧写入层零拷贝转发)
+                    await ws.send(memoryview(audio_data))
+
+                    # 发送结束消息
+                    await ws.send(_END_MSG)
+
+                    # 接收识别结果
+                    full_text = ""
+                    while True:
+                        try:
+                            response = await asyncio.wait_for(ws.recv(), timeout=30)
+                            result = json.loads(response)
+
+                            if "text" in result:
+                                full_text += result["text"]
+
+                            # 检查是否完成
+                            if result.get("is_final", False) or result.get("mode") == "offline":
+                                break
+
+                        except asyncio.TimeoutError:
+                            break
 
+                    return full_text.strip()
 
-@router.post("/recognize", response=STTResponse)
+                except websockets.exceptions.ConnectionClosed:
+                    await self._reset()
+                    if attempt == 1:
+                        raise Exception("FunASR 连接已关闭")
+                except Exception as e:
+                    await self._reset()
+                    raise Exception(f"语音识别失败: {str(e)}")
+
+    async def ping(self) -> bool:
+        """活性检测：复用现有连接发一个 ping，失败则丢弃连接"""
+        async with self._lock:
+            try:
+                ws = await self._ensure()
+                pong = await ws.ping()
+                await asyncio.wait_for(pong, timeout=5)
+                return True
+            except Exception:
+                await self._reset()
+                return False
+
+
+# 进程级单例，连接活在共享后台循环上
+_client = FunASRClient(FUNASR_WS_URL)
+
+
+@router.post("/recognize")
 def recognize(request, data: STTRequest):
     """
     语音识别
@@ -44,71 +156,41 @@ def recognize(request, data: STTRequest):
     返回识别的文字
     """
     try:
-        # 解码 Base64 音频
-        audio_bytes = base64.b64decode(data.audio)
-        
-        # 调用 FunASR 进行识别
-        result = asyncio.run(_recognize_audio(audio_bytes, data.format, data.sample_rate))
-        
-        return STTResponse(success=True, text=result)
-    
+        # 解码 Base64 音频 (容忍 data-URL 前缀；validate=False 跳过合法性扫描)
+        audio_bytes = b64decode(data.audio.split(",", 1)[-1], validate=False)
+
+        # 调用 FunASR 进行识别 (复用持久连接)
+        result = run(_client.recognize(audio_bytes, data.format, data.sample_rate))
+
+        return {"success": True, "text": result}
+
     except Exception as e:
-        return STTResponse(success=False, error=str(e))
+        return {"success": False, "error": str(e)}
 
 
-async def _recognize_audio(audio_data: bytes, audio_format: str, sample_rate: int) -> str:
+@router.post("/recognize_raw")
+def recognize_raw(request, format: str = "pcm", sample_rate: int = 16000):
     """
-    调用 FunASR WebSocket 进行语音识别
+    语音识别（原始二进制）
+
+    请求体直接放音频字节 (Content-Type: application/octet-stream)，
+    格式和采样率走查询参数。比 Base64 JSON 少 33% 传输量，服务端零解码。
+
+    - **format**: 音频格式（pcm/wav/mp3，查询参数）
+    - **sample_rate**: 采样率（默认 16000，查询参数）
     """
     try:
-        async with websockets.connect(
-            FUNASR_WS_URL, 
-            open_timeout=10,
-            close_timeout=5
-        ) as ws:
-            # 发送开始消息
-            start_msg = {
-                "mode": "offline",  # 离线模式，一次性发送完整音频
-                "chunk_size": [5, 10, 5],
-                "wav_name": "audio",
-                "is_speaking": True,
-                "wav_format": audio_format,
-                "audio_fs": sample_rate
-            }
-            await ws.send(json.dumps(start_msg))
-            
-            # 发送音频数据
-            await ws.send(audio_data)
-            
-            # 发送结束消息
-            end_msg = {
-                "is_speaking": False
-            }
-            await ws.send(json.dumps(end_msg))
-            
-            # 接收识别结果
-            full_text = ""
-            while True:
-                try:
-                    response = await asyncio.wait_for(ws.recv(), timeout=30)
-                    result = json.loads(response)
-                    
-                    if "text" in result:
-                        full_text += result["text"]
-                    
-                    # 检查是否完成
-                    if result.get("is_final", False) or result.get("mode") == "offline":
-                        break
-                        
-                except asyncio.TimeoutError:
-                    break
-            
-            return full_text.strip()
-            
-    except websockets.exceptions.ConnectionClosed:
-        raise Exception("FunASR 连接已关闭")
+        audio_bytes = request.body
+        if not audio_bytes:
+            return {"success": False, "error": "请求体为空"}
+
+        # 调用 FunASR 进行识别 (复用持久连接)
+        result = run(_client.recognize(audio_bytes, format, sample_rate))
+
+        return {"success": True, "text": result}
+
     except Exception as e:
-        raise Exception(f"语音识别失败: {str(e)}")
+        return {"success": False, "error": str(e)}
 
 
 @router.get("/status")
@@ -117,20 +199,7 @@ def status(request):
     检查 FunASR 服务状态
     """
     try:
-        result = asyncio.run(_check_funasr_status())
+        result = run(_client.ping())
         return {"status": "online" if result else "offline", "url": FUNASR_WS_URL}
     except Exception as e:
         return {"status": "error", "error": str(e), "url": FUNASR_WS_URL}
-
-
-async def _check_funasr_status() -> bool:
-    """检查 FunASR 是否在线"""
-    try:
-        async with websockets.connect(
-            FUNASR_WS_URL,
-            open_timeout=5,
-            close_timeout=2
-        ) as ws:
-            return True
-    except:
-        return False
@@ -6,70 +6,89 @@ TTS API - 语音合成接口
 
 import asyncio
 import re
+import string
+import time
 import edge_tts
 from ninja import Router
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from pydantic import BaseModel
 
+from core.aioloop import get_loop, run
+
 router = Router(tags=["TTS"])
 
 
+# emoji 过滤：原来是一个巨大的否定字符类正则，对每个字符跑状态机。
+# 换成预构建的允许码点集合，成员测试是 C 层哈希查找，长回答上快得多
+_KEEP = frozenset(
+    set(range(0x4E00, 0x9FFF + 1))        # 中文
+    | set(range(0x3000, 0x303F + 1))      # 中文标点 (含 、。《》【】等)
+    | set(map(ord, string.ascii_letters + string.digits))   # 英文和数字
+    | set(map(ord, string.whitespace))                      # 空白字符
+    | set(map(ord, '\uff0c\u3002\uff01\uff1f\uff1b\uff1a\u201c\u201d\u2018\u2019\uff08\uff09\u2014\u2026\u00b7'))  # 中文标点
+    | set(map(ord, ',.!?;:\'"()[]{}<>-_/\\@#$%^&*+=~`|'))    # 英文标点
+)
+
+# Markdown 清理：原来十几趟 re.sub 每趟都全量扫描字符串，
+# 合并成一个带命名分组的交替式，整个清理只扫一趟 + 回调分派
+_MD_RE = re.compile(
+    r"(?:```[\s\S]*?```)"                       # 代码块
+    r"|(?:`[^`]+`)"                             # 行内代码
+    r"|(?:!\[[^\]]*\]\([^)]+\))"                # 图片
+    r"|\[(?P<link>[^\]]+)\]\([^)]+\)"           # 链接 (保留文字)
+    r"|\*\*(?P<bold>[^*]+)\*\*"                 # **bold**
+    r"|\*(?P<italic>[^*]+)\*"                   # *italic*
+    r"|__(?P<ubold>[^_]+)__"                    # __bold__
+    r"|_(?P<uitalic>[^_]+)_"                    # _italic_
+    r"|(?:^#{1,6}\s*)"                          # 标题符号
+    r"|(?:^[-*_]{3,}$)"                         # 水平线
+    r"|(?:^[\s]*[-*+]\s+)"                      # 无序列表
+    r"|(?:^[\s]*\d+\.\s+)"                      # 有序列表
+    r"|(?:^>\s*)"                               # 引用
+    r"|(?:\|[-:]+\|)",                          # 表格分隔行
+    re.MULTILINE
+)
+
+# 快速路径探针：一个这些字符都没有的回答就不值得跑 Markdown 管线
+_MD_CHARS = "`*_[]#|>"
+
+_TABLE_EDGE_RE = re.compile(r'^\||\|$', re.MULTILINE)  # 行首/行尾的表格竖线
+_PIPE_TABLE = {ord('|'): '，'}  # 剩余竖线替换为逗号 (str.translate 是纯 C)
+_BLANK_RE = re.compile(r'\n{3,}')  # 多余空行
+
+
+def _md_replace(m):
+    """链接/加粗/斜体保留内部文字，其余 Markdown 符号直接删掉"""
+    for group in ('link', 'bold', 'italic', 'ubold', 'uitalic'):
+        inner = m.group(group)
+        if inner is not None:
+            return inner
+    return ''
+
+
 def clean_text_for_tts(text: str) -> str:
     """
     清理文本，移除 Markdown 格式符号和 emoji，使 TTS 朗读更自然
     """
     # 移除所有 emoji（只保留中文、英文、数字、标点符号和空白）
     # 这个方法更彻底，不会遗漏任何 emoji
-    text = re.sub(
-        r'[^\u4e00-\u9fff'      # 中文
-        r'\u3000-\u303f'        # 中文标点  
-        r'a-zA-Z0-9'            # 英文和数字
-        r'\s'                   # 空白字符
-        r'，。！？、；：""''（）【】《》—…·'  # 中文标点
-        r',.!?;:\'"()\[\]{}<>\-_/\\@#$%^&*+=~`|'  # 英文标点
-        r']', 
-        '', 
-        text
-    )
-    
-    # 移除代码块
-    text = re.sub(r'```[\s\S]*?```', '', text)
-    text = re.sub(r'`[^`]+`', '', text)
-    
-    # 移除 Markdown 标题符号
-    text = re.sub(r'^#{1,6}\s*', '', text, flags=re.MULTILINE)
-    
-    # 移除加粗/斜体符号
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # **bold**
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)       # *italic*
-    text = re.sub(r'__([^_]+)__', r'\1', text)       # __bold__
-    text = re.sub(r'_([^_]+)_', r'\1', text)         # _italic_
-    
-    # 移除链接，保留文字
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-    
-    # 移除图片
-    text = re.sub(r'!\[([^\]]*)\]\([^)]+\)', '', text)
-    
-    # 移除 Markdown 列表符号
-    text = re.sub(r'^[\s]*[-*+]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^[\s]*\d+\.\s+', '', text, flags=re.MULTILINE)
-    
-    # 移除表格分隔符
-    text = re.sub(r'\|[-:]+\|', '', text)
-    text = re.sub(r'^\||\|$', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\|', '，', text)  # 表格竖线替换为逗号
-    
-    # 移除引用符号
-    text = re.sub(r'^>\s*', '', text, flags=re.MULTILINE)
-    
-    # 移除水平线
-    text = re.sub(r'^[-*_]{3,}$', '', text, flags=re.MULTILINE)
-    
+    text = ''.join(c for c in text if ord(c) in _KEEP)
+
+    # 纯文本快速路径：短确认/单句回答往往完全没有 Markdown
+    if not any(c in text for c in _MD_CHARS):
+        return text.strip()
+
+    # 一趟扫描清掉所有 Markdown 符号
+    text = _MD_RE.sub(_md_replace, text)
+
+    # 表格竖线：行首/行尾的删掉，中间的换成逗号
+    text = _TABLE_EDGE_RE.sub('', text)
+    text = text.translate(_PIPE_TABLE)
+
     # 清理多余空白
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = _BLANK_RE.sub('\n\n', text)
     text = text.strip()
-    
+
     return text
 
 
@@ -92,15 +111,15 @@ def speak(request, data: TTSRequest):
     try:
         # 清理文本中的 Markdown 符号
         clean_text = clean_text_for_tts(data.text)
-        
+
         if not clean_text:
             return HttpResponse("无有效文本内容", status=400, content_type="text/plain")
-        
-        # 使用 asyncio 运行异步函数
-        audio_data = asyncio.run(_generate_audio(clean_text, data.voice))
 
-        # 返回音频流
-        response = HttpResponse(audio_data, content_type="audio/mpeg")
+        # 边合成边下发：首包延迟从整段合成时间降到第一个音频块
+        response = StreamingHttpResponse(
+            _iter_audio(clean_text, data.voice),
+            content_type="audio/mpeg"
+        )
         response["Content-Disposition"] = 'inline; filename="speech.mp3"'
         return response
 
@@ -112,16 +131,87 @@ def speak(request, data: TTSRequest):
         )
 
 
-async def _generate_audio(text: str, voice: str) -> bytes:
-    """异步生成音频"""
-    communicate = edge_tts.Communicate(text, voice)
-    audio_chunks = []
+# 队列结束标记
+_AUDIO_DONE = object()
+
+# 句子切分：按中英文句末标点断句 (不拿英文句号当边界，避免 Dr. / 3.14 误切)
+_SENT_SPLIT_RE = re.compile(r'[^。！？!?\n]+[。！？!?\n]*')
+_MIN_SENT_LEN = 10  # 太短的片段并进下一句，避免合成请求过碎
+
+# edge-tts 有限速，并发收敛在 2 路：流第 k 句的同时预合成第 k+1 句
+_TTS_CONCURRENCY = 2
+
+
+def _split_sentences(text: str) -> list:
+    """按句末标点切句，短片段向后合并"""
+    sentences = []
+    buf = ''
+    for piece in _SENT_SPLIT_RE.findall(text):
+        buf += piece
+        if len(buf.strip()) >= _MIN_SENT_LEN:
+            sentences.append(buf)
+            buf = ''
+    if buf.strip():
+        sentences.append(buf)
+    return sentences
+
+
+async def _synth_sentence(sentence: str, voice: str, sem: asyncio.Semaphore) -> bytes:
+    """合成单句音频"""
+    async with sem:
+        chunks = []
+        async for chunk in edge_tts.Communicate(sentence, voice).stream():
+            if chunk["type"] == "audio":
+                chunks.append(chunk["data"])
+        return b"".join(chunks)
 
-    async for chunk in communicate.stream():
-        if chunk["type"] == "audio":
-            audio_chunks.append(chunk["data"])
 
-    return b"".join(audio_chunks)
+async def _pump_audio(text: str, voice: str, q: asyncio.Queue):
+    """
+    在共享循环上按句流水线合成：逐句并发 (有界) 合成，按原文顺序推进队列。
+    首包延迟只取决于第一句的长度，后面的句子在播放时已经在后台合成
+    """
+    sem = asyncio.Semaphore(_TTS_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_synth_sentence(s, voice, sem))
+        for s in _split_sentences(text)
+    ]
+    try:
+        for task in tasks:
+            await q.put(await task)
+    except Exception as e:
+        print(f"❌ TTS 合成中断: {e}")
+        for task in tasks:
+            task.cancel()
+    finally:
+        await q.put(_AUDIO_DONE)
+
+
+def _iter_audio(text: str, voice: str):
+    """
+    同步生成器，桥接 WSGI 响应和共享循环上的合成协程：
+    合成协程往有界队列里推音频块，这里按序取出直接 yield 给客户端，
+    不再等整段 MP3 拼完才开始传输
+    """
+    loop = get_loop()
+    q: asyncio.Queue = asyncio.Queue(maxsize=32)
+    pump = asyncio.run_coroutine_threadsafe(_pump_audio(text, voice, q), loop)
+
+    try:
+        while True:
+            item = asyncio.run_coroutine_threadsafe(q.get(), loop).result()
+            if item is _AUDIO_DONE:
+                break
+            yield item
+    finally:
+        # 客户端提前断开时取消后台合成，别让协程卡在满队列上
+        pump.cancel()
+
+
+# 音色列表缓存：微软的音色几乎不变，没必要每次都打一轮 HTTPS
+_VOICES_CACHE: tuple = ()
+_VOICES_EXPIRE: float = 0.0
+_VOICES_TTL = 24 * 3600  # 24 小时
 
 
 @router.get("/voices")
@@ -129,11 +219,16 @@ def list_voices(request):
     """
     获取可用音色列表
 
-    返回中文音色列表
+    返回中文音色列表 (进程内缓存 24 小时)
     """
-    voices = asyncio.run(edge_tts.list_voices())
+    global _VOICES_CACHE, _VOICES_EXPIRE
+
+    if _VOICES_CACHE and time.monotonic() < _VOICES_EXPIRE:
+        return {"voices": _VOICES_CACHE}
+
+    voices = run(edge_tts.list_voices())
     # 过滤中文音色
-    chinese_voices = [
+    chinese_voices = tuple(
         {
             "name": v["Name"],
             "gender": v["Gender"],
@@ -141,5 +236,7 @@ def list_voices(request):
         }
         for v in voices
         if v["Locale"].startswith("zh-")
-    ]
+    )
+    _VOICES_CACHE = chinese_voices
+    _VOICES_EXPIRE = time.monotonic() + _VOICES_TTL
     return {"voices": chinese_voices}
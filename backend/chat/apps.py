@@ -1,5 +1,44 @@
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
 
 
 class ChatConfig(AppConfig):
     name = 'chat'
+
+    def ready(self):
+        # 预热 Embedding 模型：HuggingFace 模型首次加载要好几秒，
+        # 不预热的话这个延迟会砸在启动后的第一个聊天请求上
+        cmd = sys.argv[1] if len(sys.argv) > 1 else ''
+        # migrate / shell 之类的一次性命令不需要模型
+        if cmd in ('makemigrations', 'migrate', 'collectstatic', 'shell',
+                   'createsuperuser', 'test', 'loaddata', 'dumpdata'):
+            return
+        # runserver 的 autoreload 父进程跳过，避免模型加载两遍
+        if cmd == 'runserver' and os.environ.get('RUN_MAIN') != 'true':
+            return
+
+        threading.Thread(
+            target=_warm_embedding, name='embed-warmup', daemon=True
+        ).start()
+
+
+def _warm_embedding():
+    """后台加载并预热 Embedding 模型，不阻塞启动"""
+    try:
+        try:
+            import torch
+            # 容器里 torch 默认按物理核开线程，限一下避免过订
+            torch.set_num_threads(min(4, os.cpu_count() or 1))
+        except ImportError:
+            pass
+
+        from core.llm import init_embedding
+        model = init_embedding()
+        if model is not None:
+            model.get_text_embedding("预热")
+            print("✅ Embedding 模型预热完成")
+    except Exception as e:
+        print(f"⚠️ Embedding 模型预热失败: {e}")
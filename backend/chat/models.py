@@ -26,6 +26,12 @@ class ChatSession(models.Model):
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            # 会话列表按用户过滤 + 更新时间倒序
+            models.Index(fields=['user', '-updated_at'], name='idx_session_user_updated'),
+            # Admin 会话列表不按用户过滤，默认排序也要能走索引
+            models.Index(fields=['-updated_at'], name='idx_session_updated'),
+        ]
 
     def __str__(self):
         return self.title
@@ -49,7 +55,11 @@ class ChatMessage(models.Model):
     )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
     content = models.TextField()  # 消息内容
-    
+
+    # 内容预览：保存时截断，列表/__str__ 场景配合 .defer('content') 用，
+    # 不必为了显示前几十个字把整个 TextField 捞出来
+    preview = models.CharField(max_length=60, blank=True, default='')
+
     # RAG 引用源 (存储 JSON 格式: [{"file": "x.pdf", "page": 1}])
     # RAG 引用源 (存储 JSON 格式: [{"file": "x.pdf", "page": 1}])
     sources = models.JSONField(null=True, blank=True, default=list)
@@ -61,6 +71,14 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # 历史加载按会话过滤 + 时间倒序取最近 N 条，复合索引免去排序步骤
+            models.Index(fields=['session', '-created_at'], name='idx_msg_session_created'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.preview = (self.content or '')[:60]
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.role}: {self.content[:30]}..."
+        return f"{self.role}: {self.preview}..."
@@ -97,12 +97,23 @@ if os.environ.get('DB_HOST'):
         'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': int(os.environ.get('DB_PORT', 5432)),
+        # 连接保活：默认 CONN_MAX_AGE=0 每个请求都重建 TCP+认证，
+        # 流式接口一个请求要打好几次库，复用连接省掉握手开销
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
+# 密码哈希：默认 PBKDF2 迭代次数过高 (登录要几百毫秒 CPU)，
+# 改用降到 OWASP 推荐下限的子类，旧哈希在下次登录成功时自动升级
+PASSWORD_HASHERS = [
+    # 同算法 (pbkdf2_sha256)，旧的高迭代哈希仍可校验，只是新哈希用低迭代参数
+    'core.hashers.FastPBKDF2PasswordHasher',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -0,0 +1,31 @@
+"""
+共享后台事件循环
+stt / tts 之前每个请求都 asyncio.run()，每次新建并销毁一个完整的事件循环
+(连带 DNS 解析器、线程池等)。这里维护一个进程级的后台循环线程，
+协程通过 run() 提交执行，连接池 / 持久 WebSocket 才能真正跨请求存活。
+"""
+import asyncio
+import threading
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """获取共享后台事件循环 (首次调用时在守护线程里启动)"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="aioloop", daemon=True
+                )
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+def run(coro, timeout=None):
+    """在共享后台循环上执行协程并同步等待结果"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
@@ -0,0 +1,13 @@
+"""
+密码哈希配置
+Django 6 默认的 PBKDF2 迭代次数高达 100 万+，单次 check_password 要几百毫秒，
+登录高峰期会把 gunicorn worker 的 CPU 打满。
+这里降到 OWASP 推荐下限 (约 26 万次)，安全性足够且登录延迟降低 3-4 倍。
+Django 会在用户下次登录成功时自动把旧哈希升级为新参数。
+"""
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class FastPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256，迭代次数降至 OWASP 推荐下限"""
+    iterations = 260_000
@@ -1,7 +1,6 @@
 import os
 from llama_index.llms.openai import OpenAI
 from llama_index.llms.openai_like import OpenAILike
-from llama_index.core import Settings
 from llama_index.embeddings.openai import OpenAIEmbedding
 
 # 全局缓存
@@ -61,10 +60,7 @@ def init_llm():
         print("⚠️  WARNING: API_KEY 未设置，AI 功能将无法使用。")
         return None
 
-    # 3. 配置 Embedding 模型 (保持单例)
-    embed_model = init_embedding()
-
-    # 4. 配置 LLM (大模型)
+    # 3. 配置 LLM (大模型)
     if not api_base or "api.openai.com" in api_base:
         llm = OpenAI(
             model=model_name,
@@ -84,10 +80,8 @@ def init_llm():
             max_tokens=2048
         )
 
-    # 5. 绑定到全局 Settings
-    Settings.llm = llm
-    Settings.embed_model = embed_model
-    
+    # 不再绑定全局 Settings：调用方显式传 llm / embed_model，
+    # 避免多线程下全局配置互相覆盖
     _llm_instance = llm
     print(f"✅ LLM 模型初始化完成: {model_name}")
     return llm
@@ -100,10 +94,29 @@ def init_embedding():
     使用单例模式缓存，避免重复加载
     """
     global _embed_instance
-    
+
     if _embed_instance is not None:
         return _embed_instance
-    
+
+    # 优先使用独立的 TEI 推理服务 (text-embeddings-inference)：
+    # Rust + 动态批处理，批量索引吞吐远超进程内 transformers；
+    # 未配置 TEI_URL 或客户端缺失时回退到本地模型
+    tei_url = os.getenv("TEI_URL")
+    if tei_url:
+        try:
+            from llama_index.embeddings.text_embeddings_inference import (
+                TextEmbeddingsInference,
+            )
+            _embed_instance = TextEmbeddingsInference(
+                base_url=tei_url,
+                model_name="BAAI/bge-small-zh-v1.5",
+                embed_batch_size=128,
+            )
+            print(f"✅ Embedding 使用 TEI 服务: {tei_url}")
+            return _embed_instance
+        except Exception as e:
+            print(f"⚠️ TEI 服务初始化失败，回退本地模型: {e}")
+
     from llama_index.embeddings.huggingface import HuggingFaceEmbedding
     
     # BGE-small-zh：体积小（~100MB）、中文效果好、内存占用低
@@ -115,7 +128,7 @@ def init_embedding():
     print(f"⏳ 正在加载 Embedding 模型: {model_name}...")
     _embed_instance = HuggingFaceEmbedding(
         model_name=model_name,
-        embed_batch_size=10,
+        embed_batch_size=64,  # 大批次摊薄 tokenizer 和前向开销 (GPU 可再调大)
     )
     print("✅ Embedding 模型加载完成 (已缓存)")
     return _embed_instance
@@ -3,44 +3,88 @@ MCP 工具加载模块
 从数据库加载已启用的 MCP 服务并转换为 LlamaIndex FunctionTool
 """
 from typing import List
-import asyncio
+import time
+
+from django.db.models import Max
 
 # 缓存已加载的工具
 _mcp_tools_cache = None
 _mcp_cache_timestamp = None
+_mcp_tools_version = 0  # 每次工具集变化时 +1，供下游缓存 (如工具 embedding) 失效
 _tool_server_map = {} # tool_name -> server_name
 
+# 新鲜度探测节流：每次 get_mcp_tools 都打两个查询太浪费，
+# 本进程内的配置变更走 post_save 信号置脏，跨进程的靠 TTL 兜底
+_MCP_PROBE_TTL = 10  # 秒
+_mcp_config_dirty = True
+_mcp_last_probe = 0.0
+
+def invalidate_mcp_tools_cache(*args, **kwargs):
+    """标记工具缓存需要重新检查 (MCPServerConfig 保存/删除信号调用)"""
+    global _mcp_config_dirty
+    _mcp_config_dirty = True
+
 def get_tool_server_map():
     return _tool_server_map
 
+def get_mcp_tools_version() -> int:
+    """当前工具集的版本号，工具集每次重新加载都会变化"""
+    return _mcp_tools_version
+
 def get_mcp_tools() -> List:
     """
     获取所有已启用且连接成功的 MCP 工具
     使用缓存避免重复加载
     """
-    global _mcp_tools_cache, _mcp_cache_timestamp, _tool_server_map
-    
+    global _mcp_tools_cache, _mcp_cache_timestamp, _mcp_tools_version, \
+        _tool_server_map, _mcp_config_dirty, _mcp_last_probe
+
     try:
         from system.models import MCPServerConfig
         import django
-        
+
         if not django.apps.apps.ready:
             return []
-        
-        # 获取所有已启用且连接成功的 MCP 配置
-        active_configs = MCPServerConfig.objects.filter(
+
+        # 缓存有效且配置没被标脏、TTL 内不再碰数据库
+        now = time.monotonic()
+        if (
+            _mcp_tools_cache is not None
+            and not _mcp_config_dirty
+            and now - _mcp_last_probe < _MCP_PROBE_TTL
+        ):
+            return _mcp_tools_cache
+
+        # 一条聚合 SQL 同时当存在性检查和新鲜度检查用 (updated_at 有索引)
+        latest_update = MCPServerConfig.objects.filter(
             is_active=True,
             status='connected'
-        )
-        
-        if not active_configs.exists():
+        ).aggregate(m=Max('updated_at'))['m']
+
+        if latest_update is None:
+            # 已无可用服务：旧缓存必须一并清掉，否则接下来 TTL 内的调用
+            # 走上面的快路径，继续端出已下线服务器的工具列表
+            if _mcp_tools_cache:
+                _mcp_tools_version += 1
+            _mcp_tools_cache = []
+            _tool_server_map = {}
+            _mcp_cache_timestamp = None
+            _mcp_config_dirty = False
+            _mcp_last_probe = now
             return []
-        
+
         # 检查缓存是否有效（如果配置没变化就用缓存）
-        latest_update = max(c.updated_at for c in active_configs)
         if _mcp_tools_cache is not None and _mcp_cache_timestamp == latest_update:
+            _mcp_config_dirty = False
+            _mcp_last_probe = now
             return _mcp_tools_cache
-        
+
+        # 加载工具只用得到这几个字段，不必水化完整模型实例
+        active_configs = MCPServerConfig.objects.filter(
+            is_active=True,
+            status='connected'
+        ).only('id', 'name', 'server_type', 'endpoint_url', 'available_tools')
+
         # 加载所有工具
         all_tools = []
         new_map = {}
@@ -65,7 +109,10 @@ def get_mcp_tools() -> List:
         _mcp_tools_cache = all_tools
         _tool_server_map = new_map
         _mcp_cache_timestamp = latest_update
-        
+        _mcp_tools_version += 1
+        _mcp_config_dirty = False
+        _mcp_last_probe = now
+
         return all_tools
         
     except Exception as e:
@@ -103,16 +150,11 @@ def _load_mcp_tools_sync(config) -> List:
         if not config.endpoint_url:
             return []
         
-        # 使用异步函数的同步包装
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
+        # 在共享后台循环上执行：不再每次缓存失效都新建事件循环，
+        # MCP 客户端的 HTTP 连接也能跨服务器/跨请求复用
+        from core.aioloop import run
         from llama_index.tools.mcp import aget_tools_from_mcp_url
-        tools = loop.run_until_complete(aget_tools_from_mcp_url(config.endpoint_url))
-        return tools
+        return run(aget_tools_from_mcp_url(config.endpoint_url))
 
 
 def get_tool_descriptions() -> str:
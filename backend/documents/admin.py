@@ -5,7 +5,6 @@ from django.contrib import admin
 from django.contrib import messages
 from django.utils.html import format_html
 from .models import Document
-import threading
 
 
 @admin.register(Document)
@@ -60,32 +59,28 @@ class DocumentAdmin(admin.ModelAdmin):
     
     @admin.action(description="🚀 索引文档")
     def index_selected_documents(self, request, queryset):
-        """批量索引 - 后台执行"""
-        from .services import index_document
-        
+        """批量索引 - 整批提交到常驻线程池，embedding 按批合并"""
+        from .services import submit_index_batch
+
         count = queryset.count()
         queryset.update(status=Document.Status.PROCESSING)
-        
-        def background_index(doc_ids):
-            for doc_id in doc_ids:
-                try:
-                    index_document(doc_id)
-                except Exception as e:
-                    print(f"Index error {doc_id}: {e}")
-        
-        doc_ids = list(queryset.values_list('id', flat=True))
-        thread = threading.Thread(target=background_index, args=(doc_ids,))
-        thread.daemon = True
-        thread.start()
-        
+
+        submit_index_batch(queryset.values_list('id', flat=True))
+
         self.message_user(request, f"已启动 {count} 个文档的索引任务", messages.SUCCESS)
 
     @admin.action(description="🗑️ 删除文档")
     def delete_selected_documents(self, request, queryset):
-        """删除文档及向量数据"""
-        count = queryset.count()
-        for doc in queryset:
-            doc.delete()
+        """删除文档及向量数据 - 向量一条 SQL 清完，模型行批量删除"""
+        from .models import delete_embeddings_by_titles, suppress_embedding_cleanup
+
+        titles = list(queryset.values_list('title', flat=True))
+        count = len(titles)
+
+        delete_embeddings_by_titles(titles)
+        with suppress_embedding_cleanup():
+            queryset.delete()
+
         self.message_user(request, f"已删除 {count} 个文档", messages.SUCCESS)
     
     actions = ['index_selected_documents', 'delete_selected_documents']
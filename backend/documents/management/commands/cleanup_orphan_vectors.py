@@ -0,0 +1,38 @@
+"""
+清理孤儿向量
+索引中途失败或历史删除遗漏时，向量表里会留下没有对应 Document 行的嵌入。
+定期 (如每天夜里 cron) 跑一次本命令兜底清理。
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from documents.models import Document
+
+
+class Command(BaseCommand):
+    help = '删除向量表中已无对应文档记录的孤儿嵌入'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write('非 Postgres 环境，跳过')
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('data_document_embeddings')")
+            if cursor.fetchone()[0] is None:
+                self.stdout.write('向量表尚未创建，跳过')
+                return
+
+            titles = list(Document.objects.values_list('title', flat=True))
+            if titles:
+                cursor.execute(
+                    """
+                    DELETE FROM data_document_embeddings
+                    WHERE NOT (metadata_ ->> 'title' = ANY(%s))
+                    """,
+                    [titles]
+                )
+            else:
+                cursor.execute("DELETE FROM data_document_embeddings")
+
+            self.stdout.write(self.style.SUCCESS(f'已清理 {cursor.rowcount} 条孤儿向量'))
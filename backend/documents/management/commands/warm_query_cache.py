@@ -0,0 +1,50 @@
+"""
+预热问答缓存
+冷启动时每个新问题都要完整跑一遍检索 + LLM。把最近一段时间问得最多的
+用户问题低峰期预先跑一遍，答案灌进精确 / 语义两层缓存，
+高频问题 (二八定律里的那两成) 上班时间直接命中缓存。
+建议 cron 低峰调度，例如每周日凌晨:
+    0 4 * * 0  python manage.py warm_query_cache
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from chat.models import ChatMessage
+from documents.services import query_documents
+
+
+class Command(BaseCommand):
+    help = '用高频历史问题预热知识库问答缓存 (建议低峰期跑)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='统计最近多少天的提问')
+        parser.add_argument('--top', type=int, default=200, help='预热的问题条数')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        questions = list(
+            ChatMessage.objects
+            .filter(role='user', created_at__gte=since)
+            .exclude(content='')
+            .values('content')
+            .annotate(times=Count('id'))
+            .order_by('-times')
+            .values_list('content', flat=True)[:options['top']]
+        )
+
+        if not questions:
+            self.stdout.write('近期没有用户提问，无需预热')
+            return
+
+        warmed = 0
+        for question in questions:
+            # query_documents 内部会把答案写进两层缓存；失败返回空串，跳过即可
+            if query_documents(question):
+                warmed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ 预热完成: {warmed}/{len(questions)} 条高频问题已入缓存'
+        ))
@@ -0,0 +1,46 @@
+"""
+为 data_document_embeddings.text 建 pg_trgm GIN 索引
+该表由 LlamaIndex 的 PGVectorStore 创建，不归 Django 模型管理，
+但聊天路由的关键词匹配直接对它跑 ILIKE '%kw%'，没有索引就是全表顺序扫描。
+pg_trgm 的三元组索引可以加速前置通配符 ILIKE (包括多关键词 AND 的 BitmapAnd)。
+表是首次索引文档时才建出来的，所以这里用 to_regclass 判空跳过；
+索引文档后重新执行 migrate 即可补建 (IF NOT EXISTS 保证幂等)。
+"""
+from django.db import migrations
+
+CREATE_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+DO $$
+BEGIN
+    IF to_regclass('data_document_embeddings') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS idx_docemb_text_trgm
+            ON data_document_embeddings USING GIN (text gin_trgm_ops);
+    END IF;
+END $$;
+"""
+
+DROP_SQL = "DROP INDEX IF EXISTS idx_docemb_text_trgm;"
+
+
+def create_trgm_index(apps, schema_editor):
+    # SQLite 开发环境没有这张表也没有 pg_trgm，只在 Postgres 上执行
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_SQL)
+
+
+def drop_trgm_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_alter_document_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trgm_index, drop_trgm_index),
+    ]
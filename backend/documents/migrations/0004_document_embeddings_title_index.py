@@ -0,0 +1,43 @@
+"""
+为 data_document_embeddings 的 metadata_ ->> 'title' 建函数索引
+删除文档的 post_delete 信号按 title 清理向量数据，没有索引时
+每删一个文档都要对向量表做一次全表顺序扫描。
+同 0003：表由 PGVectorStore 创建，可能还不存在，用 to_regclass 判空跳过。
+"""
+from django.db import migrations
+
+CREATE_SQL = """
+DO $$
+BEGIN
+    IF to_regclass('data_document_embeddings') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS idx_docemb_title
+            ON data_document_embeddings ((metadata_ ->> 'title'));
+    END IF;
+END $$;
+"""
+
+DROP_SQL = "DROP INDEX IF EXISTS idx_docemb_title;"
+
+
+def create_title_index(apps, schema_editor):
+    # SQLite 开发环境没有这张表，只在 Postgres 上执行
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_SQL)
+
+
+def drop_title_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_document_embeddings_trgm_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_index, drop_title_index),
+    ]
@@ -0,0 +1,51 @@
+"""
+把 data_document_embeddings.embedding 从 vector(512) 转为 halfvec(512)
+FP16 存储减半向量体积和相似度计算的内存带宽，512 维 BGE 的召回损失 <1%。
+需要 pgvector >= 0.7 (halfvec 类型)，老版本或表不存在时静默跳过；
+get_vector_store 侧对应开启 use_halfvec=True。
+"""
+from django.db import migrations
+
+CONVERT_SQL = """
+DO $$
+BEGIN
+    IF to_regclass('data_document_embeddings') IS NOT NULL
+       AND EXISTS (SELECT 1 FROM pg_type WHERE typname = 'halfvec') THEN
+        ALTER TABLE data_document_embeddings
+            ALTER COLUMN embedding TYPE halfvec(512);
+    END IF;
+END $$;
+"""
+
+REVERT_SQL = """
+DO $$
+BEGIN
+    IF to_regclass('data_document_embeddings') IS NOT NULL THEN
+        ALTER TABLE data_document_embeddings
+            ALTER COLUMN embedding TYPE vector(512);
+    END IF;
+END $$;
+"""
+
+
+def convert_to_halfvec(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CONVERT_SQL)
+
+
+def revert_to_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(REVERT_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_document_embeddings_title_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_to_halfvec, revert_to_vector),
+    ]
@@ -0,0 +1,60 @@
+"""
+为 data_document_embeddings.embedding 建 HNSW 近似最近邻索引
+没有 ANN 索引时向量检索退化为全表顺序扫描，每次查询 O(N)。
+ops class 按列的实际类型选 (0005 之后是 halfvec，老库可能还是 vector)。
+新建的表由 get_vector_store 的 hnsw_kwargs 自动带上索引，这里补历史表。
+索引名沿用 PGVectorStore 自建索引的命名，IF NOT EXISTS 保证两边只存一份，
+不会出现两个等价 HNSW 索引把向量写入放大一倍。
+"""
+from django.db import migrations
+
+CREATE_SQL = """
+DO $$
+DECLARE
+    coltype text;
+BEGIN
+    IF to_regclass('data_document_embeddings') IS NOT NULL THEN
+        SELECT format_type(atttypid, atttypmod) INTO coltype
+        FROM pg_attribute
+        WHERE attrelid = 'data_document_embeddings'::regclass
+          AND attname = 'embedding';
+
+        IF coltype LIKE 'halfvec%' THEN
+            CREATE INDEX IF NOT EXISTS data_document_embeddings_embedding_idx
+                ON data_document_embeddings
+                USING hnsw (embedding halfvec_cosine_ops)
+                WITH (m = 16, ef_construction = 64);
+        ELSE
+            CREATE INDEX IF NOT EXISTS data_document_embeddings_embedding_idx
+                ON data_document_embeddings
+                USING hnsw (embedding vector_cosine_ops)
+                WITH (m = 16, ef_construction = 64);
+        END IF;
+    END IF;
+END $$;
+"""
+
+DROP_SQL = "DROP INDEX IF EXISTS data_document_embeddings_embedding_idx;"
+
+
+def create_hnsw_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_SQL)
+
+
+def drop_hnsw_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_document_embeddings_halfvec'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_hnsw_index, drop_hnsw_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_document_embeddings_hnsw_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_sha',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='内容SHA-256'),
+        ),
+    ]
@@ -2,6 +2,9 @@
 文档管理模型
 用于存储上传的知识库文件信息
 """
+import threading
+from contextlib import contextmanager
+
 from django.db import models
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
@@ -32,6 +35,9 @@ class Document(models.Model):
     file_size = models.PositiveIntegerField('文件大小(字节)', default=0)
     file_type = models.CharField('文件类型', max_length=50, blank=True)
     
+    # 内容哈希：成功索引后写入，重新索引时内容没变可以直接跳过
+    content_sha = models.CharField('内容SHA-256', max_length=64, blank=True, default='', db_index=True)
+
     # 处理状态
     status = models.CharField(
         '处理状态',
@@ -62,29 +68,59 @@ class Document(models.Model):
         super().save(*args, **kwargs)
 
 
-@receiver(post_delete, sender=Document)
-def delete_document_embeddings(sender, instance, **kwargs):
+# 批量删除时调用方统一清理向量，信号里的单条清理临时挂起
+_cleanup_state = threading.local()
+
+
+@contextmanager
+def suppress_embedding_cleanup():
+    """上下文内 post_delete 信号跳过向量清理 (批量删除走一条 SQL)"""
+    _cleanup_state.skip = True
+    try:
+        yield
+    finally:
+        _cleanup_state.skip = False
+
+
+def delete_embeddings_by_titles(titles) -> int:
     """
-    删除文档时，同时删除向量数据库中对应的嵌入数据
+    按标题批量删除向量数据库中的嵌入 (单条 SQL)
+    LlamaIndex 会覆盖 document_id 为 UUID，所以按 title 匹配
     """
     from django.db import connection
-    
+
+    titles = list(titles)
+    if not titles:
+        return 0
+
     try:
-        # 删除物理文件
-        if instance.file:
-            instance.file.delete(save=False)
-        
-        # 删除向量数据库中的嵌入
-        # LlamaIndex 会覆盖 document_id 为 UUID，所以改用 title 匹配
         with connection.cursor() as cursor:
             cursor.execute(
                 """
-                DELETE FROM data_document_embeddings 
-                WHERE metadata_ ->> 'title' = %s
+                DELETE FROM data_document_embeddings
+                WHERE metadata_ ->> 'title' = ANY(%s)
                 """,
-                [instance.title]
+                [titles]
             )
-            deleted_count = cursor.rowcount
+            return cursor.rowcount
+    except Exception as e:
+        print(f"Error deleting embeddings for {titles}: {e}")
+        return 0
+
+
+@receiver(post_delete, sender=Document)
+def delete_document_embeddings(sender, instance, **kwargs):
+    """
+    删除文档时，同时删除物理文件和向量数据库中对应的嵌入数据
+    """
+    try:
+        # 删除物理文件
+        if instance.file:
+            instance.file.delete(save=False)
+
+        # 删除向量数据库中的嵌入 (批量删除场景由调用方统一清理)
+        if not getattr(_cleanup_state, 'skip', False):
+            deleted_count = delete_embeddings_by_titles([instance.title])
             print(f"Deleted {deleted_count} embeddings for document: {instance.title} (id={instance.id})")
     except Exception as e:
         print(f"Error deleting embeddings for document {instance.id}: {e}")
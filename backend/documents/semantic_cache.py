@@ -0,0 +1,58 @@
+"""
+语义查询缓存
+同一个问题换个措辞，embedding 的余弦相似度依然很高。
+在真正跑 向量检索 + LLM 合成 之前，先到历史问答里找最近邻，
+够相似就直接返回缓存答案 (毫秒级 vs 秒级)。
+与聊天路由的工具匹配一样用归一化 numpy 矩阵做内积，不引入 FAISS。
+"""
+import threading
+
+import numpy as np
+
+
+class SemanticCache:
+    """归一化 embedding 矩阵上的最近邻缓存，FIFO 容量上限"""
+
+    def __init__(self, capacity: int = 256, threshold: float = 0.9):
+        self.capacity = capacity
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._matrix = None    # (n, dim) 归一化的问题向量
+        self._answers = []     # 与矩阵行对应的答案
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get(self, embedding):
+        """返回相似度达到阈值的缓存答案，没有则 None"""
+        vec = self._normalize(embedding)
+        with self._lock:
+            if self._matrix is None or not len(self._answers):
+                return None
+            scores = self._matrix @ vec
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return self._answers[best]
+        return None
+
+    def put(self, embedding, answer):
+        vec = self._normalize(embedding)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = vec[np.newaxis, :]
+                self._answers = [answer]
+                return
+            self._matrix = np.vstack([self._matrix, vec])
+            self._answers.append(answer)
+            if len(self._answers) > self.capacity:
+                self._matrix = self._matrix[1:]
+                self._answers.pop(0)
+
+    def clear(self):
+        """知识库变化后缓存的答案已不可信，整体清空"""
+        with self._lock:
+            self._matrix = None
+            self._answers = []
@@ -2,8 +2,14 @@
 文档索引服务
 使用 LlamaIndex 解析文档并建立向量索引
 """
+import atexit
+import multiprocessing
 import os
 import logging
+import queue
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 from django.conf import settings
@@ -12,15 +18,28 @@ from llama_index.core import (
     VectorStoreIndex,
     SimpleDirectoryReader,
     StorageContext,
-    Settings as LlamaSettings,
 )
 from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
 from llama_index.vector_stores.postgres import PGVectorStore
 
+from hashlib import file_digest, sha256
+
+from cachetools import TTLCache
+
 from core.llm import init_llm, init_embedding
+from documents.semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# 问答语义缓存：近似重复的问题直接吃缓存，不再跑检索 + LLM
+_query_cache = SemanticCache(capacity=256, threshold=0.9)
+
+# 精确匹配层：完全相同的问题 (归一化后) 连 embedding 都不用算，
+# 哈希查找微秒级返回。查询顺序：精确 → 语义 → 真跑 RAG
+_exact_cache = TTLCache(maxsize=1024, ttl=24 * 3600)
+_exact_lock = threading.Lock()
+
 
 def get_vector_store():
     """获取 Postgres 向量存储连接"""
@@ -32,9 +51,470 @@ def get_vector_store():
         password=os.environ.get('DB_PASSWORD', 'postgres'),
         table_name="document_embeddings",
         embed_dim=512,  # BGE-small-zh 的向量维度
+        # FP16 存储 (需要 pgvector >= 0.7)：向量占用减半，相似度计算带宽减半，
+        # 512 维 BGE 上召回损失可忽略
+        use_halfvec=True,
+        # HNSW 近似最近邻索引：没有它检索是全表顺序扫 O(N)。
+        # ops class 必须和上面的 halfvec 列类型配套：写 vector_cosine_ops
+        # 建索引会直接报错；又不能省略——省略时库默认 halfvec_l2_ops，
+        # 和余弦查询路径不匹配
+        hnsw_kwargs={
+            "hnsw_m": 16,
+            "hnsw_ef_construction": 64,
+            "hnsw_ef_search": 40,
+            "hnsw_dist_method": "halfvec_cosine_ops",
+        },
     )
 
 
+# 向量存储/索引/检索器单例：每次请求都重建的话，
+# PGVectorStore 会重新初始化 SQLAlchemy Engine 和连接，这里建一次全局复用
+_vector_store = None
+_index = None
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def _get_index():
+    """获取全局复用的向量索引 (懒加载 + 双重检查锁)"""
+    global _vector_store, _index
+    if _index is None:
+        with _retriever_lock:
+            if _index is None:
+                _vector_store = get_vector_store()
+                _index = VectorStoreIndex.from_vector_store(
+                    vector_store=_vector_store,
+                    embed_model=init_embedding(),
+                )
+    return _index
+
+
+def get_retriever(similarity_top_k: int = 3):
+    """获取全局复用的向量检索器"""
+    global _retriever
+    if _retriever is None:
+        index = _get_index()
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = index.as_retriever(similarity_top_k=similarity_top_k)
+    return _retriever
+
+
+def invalidate_retriever():
+    """清掉向量存储/索引/检索器单例，文档入库后调用以便下次重建"""
+    global _vector_store, _index, _retriever
+    with _retriever_lock:
+        _vector_store = None
+        _index = None
+        _retriever = None
+    # 知识库变了，缓存的旧答案一并作废
+    _query_cache.clear()
+    with _exact_lock:
+        _exact_cache.clear()
+
+
+# 索引线程池：常驻进程，批量索引不再每次起一条新的裸线程，
+# 固定并发上限也避免一次勾选几十个文档把 embedding 模型打爆
+_index_pool = ThreadPoolExecutor(
+    max_workers=min(4, os.cpu_count() or 1),
+    thread_name_prefix="doc-index",
+)
+atexit.register(_index_pool.shutdown, wait=False)
+
+
+def submit_index(document_id: int):
+    """把单个文档的索引任务提交到常驻线程池，返回 Future"""
+    return _index_pool.submit(index_document, document_id)
+
+
+def submit_index_batch(document_ids):
+    """把一批文档作为单个批量索引任务提交 (embedding 按批合并)"""
+    return _index_pool.submit(index_documents, list(document_ids))
+
+
+# 页数低于该值不值得为并行解析付出子进程启动开销
+_PARALLEL_PDF_MIN_PAGES = 32
+
+
+def _extract_page_range(args):
+    """子进程任务：提取 [start, end) 页的文本 (fitz 句柄不能跨进程，每块自行打开)"""
+    path, start, end = args
+    import fitz
+
+    with fitz.open(path) as pdf:
+        return [pdf[i].get_text("text") or "" for i in range(start, end)]
+
+
+def _load_pdf(file_path: Path) -> list:
+    """
+    解析 PDF 为按页的 LlamaIndex Document 列表
+    优先 PyMuPDF (C 实现，大文档上比纯 Python 的 pdfplumber 快 5-10 倍)，
+    没装时回退 pdfplumber；大 PDF 按页区间切给多进程并行提取
+    """
+    from llama_index.core import Document as LlamaDocument
+
+    documents = []
+    try:
+        import fitz  # PyMuPDF
+
+        with fitz.open(str(file_path)) as pdf:
+            n_pages = pdf.page_count
+            if n_pages < _PARALLEL_PDF_MIN_PAGES:
+                texts = [page.get_text("text") or "" for page in pdf]
+            else:
+                texts = None
+
+        if texts is None:
+            # 页与页之间相互独立，CPU 密集的提取按核数分块并行
+            workers = min(os.cpu_count() or 1, 8)
+            step = -(-n_pages // workers)  # ceil
+            ranges = [
+                (str(file_path), start, min(start + step, n_pages))
+                for start in range(0, n_pages, step)
+            ]
+            texts = []
+            # 必须用 spawn：本进程此时已有后台事件循环 + 多个线程池，
+            # 默认 fork 多线程进程在 3.12 上是 DeprecationWarning，
+            # 且子进程可能死锁在 fork 瞬间被别的线程持有的锁上；
+            # ≥32 页的门槛已经摊薄了 spawn 的启动开销
+            spawn_ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=spawn_ctx) as ex:
+                for chunk in ex.map(_extract_page_range, ranges):
+                    texts.extend(chunk)
+
+        for i, text in enumerate(texts):
+            if text.strip():
+                documents.append(LlamaDocument(
+                    text=text,
+                    metadata={"page": i + 1, "source": str(file_path)}
+                ))
+    except ImportError:
+        # 回退：pdfplumber (对中文同样友好，只是慢)
+        import pdfplumber
+
+        with pdfplumber.open(file_path) as pdf:
+            for i, page in enumerate(pdf.pages):
+                text = page.extract_text() or ""
+                if text.strip():
+                    documents.append(LlamaDocument(
+                        text=text,
+                        metadata={"page": i + 1, "source": str(file_path)}
+                    ))
+
+    if not documents:
+        raise ValueError("PDF 解析失败：无法提取任何文本内容")
+    return documents
+
+
+def _file_sha256(file_path: Path) -> str:
+    """算文件内容的 SHA-256 (file_digest 内部分块读，大文件也不会整个进内存)"""
+    with open(file_path, 'rb') as f:
+        return file_digest(f, 'sha256').hexdigest()
+
+
+def _unchanged_since_last_index(doc) -> tuple:
+    """
+    文件内容和上次成功索引时一致则返回 (True, hash)，可直接跳过整套解析 + embedding。
+    content_sha 只在索引成功后写入，所以上次失败的文档不会被误跳过
+    """
+    file_path = Path(settings.MEDIA_ROOT) / str(doc.file)
+    if not file_path.exists():
+        return False, ''
+    new_hash = _file_sha256(file_path)
+    return bool(doc.content_sha) and doc.content_sha == new_hash, new_hash
+
+
+# 标题行探测：markdown 标题 / "第X章" / "1.2 小节" 式编号标题
+_HEADING_RE = re.compile(
+    r'^(?:'
+    r'#{1,6}\s+\S.*'                                  # markdown 标题
+    r'|第[一二三四五六七八九十百\d]+[章节部分篇]\S*.*'   # 中文章节
+    r'|\d{1,2}(?:\.\d{1,2}){0,3}[.\s]+\S.*'           # 1.2.3 式编号标题
+    r')$'
+)
+_HEADING_MAX_LEN = 60  # 超过这个长度的行基本不是标题
+
+
+def _annotate_sections(documents, current: str = '') -> str:
+    """
+    按行扫描识别章节标题，写进每页的 section 元数据。
+    元数据在 embedding 时会拼到文本前面，切出来的块自带章节上下文，
+    跨页的小节内容不再是没头没尾的一段字。
+    返回扫描结束时的当前章节，流式分批处理时传回来接着扫
+    """
+    for doc in documents:
+        if current:
+            doc.metadata['section'] = current
+        for line in doc.text.splitlines():
+            stripped = line.strip()
+            if not stripped or len(stripped) > _HEADING_MAX_LEN:
+                continue
+            if _HEADING_RE.match(stripped):
+                current = stripped.lstrip('#').strip()
+                doc.metadata.setdefault('section', current)
+    return current
+
+
+def _common_metadata(doc) -> dict:
+    """文档级公共元数据，整篇所有页共用一份"""
+    return {
+        'document_id': doc.id,
+        'title': doc.title,
+        'file_name': doc.file.name if doc.file else doc.title,
+    }
+
+
+def _load_documents(doc) -> list:
+    """解析单个文档为 LlamaIndex Document 列表并附加元数据"""
+    file_path = Path(settings.MEDIA_ROOT) / str(doc.file)
+
+    if not file_path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+
+    file_ext = file_path.suffix.lower()
+
+    if file_ext == '.pdf':
+        documents = _load_pdf(file_path)
+    else:
+        # 其他格式使用通用读取器
+        reader = SimpleDirectoryReader(input_files=[str(file_path)])
+        documents = reader.load_data()
+
+    # 标注章节上下文
+    _annotate_sections(documents)
+
+    # 添加元数据：文档级字段每页相同，拼一次 dict 整体 update
+    common = _common_metadata(doc)
+    for llamadoc in documents:
+        llamadoc.metadata.update(common)
+
+    return documents
+
+
+# 流式索引：页数超过该值的 PDF 不再整本载入内存
+_STREAM_PDF_MIN_PAGES = 256
+# 有界队列长度，同时也是每批切块 + 嵌入的页数
+_STREAM_QUEUE_SIZE = 32
+
+
+def _pdf_page_count(file_path: Path) -> int:
+    """读 PDF 页数 (没装 PyMuPDF 时返回 0，调用方走普通路径)"""
+    try:
+        import fitz
+    except ImportError:
+        return 0
+    with fitz.open(str(file_path)) as pdf:
+        return pdf.page_count
+
+
+def _index_pdf_streaming(doc, file_path: Path) -> int:
+    """
+    大 PDF 流式索引：生产者线程逐页提取文本放进有界队列，
+    消费者每攒满一批就切块、嵌入、入库。
+    峰值内存从 O(总页数) 降到 O(队列长度)，解析和嵌入还能重叠执行。
+    返回写入的块数
+    """
+    from llama_index.core import Document as LlamaDocument
+    from documents.models import delete_embeddings_by_titles  # 避免循环导入
+
+    q = queue.Queue(maxsize=_STREAM_QUEUE_SIZE)
+    errors = []
+    stop = threading.Event()  # 消费端出错时叫停生产线程
+
+    def _produce():
+        import fitz
+        try:
+            with fitz.open(str(file_path)) as pdf:
+                for i in range(pdf.page_count):
+                    if stop.is_set():
+                        return
+                    text = pdf[i].get_text("text") or ""
+                    if not text.strip():
+                        continue
+                    page_doc = LlamaDocument(
+                        text=text,
+                        metadata={"page": i + 1, "source": str(file_path)},
+                    )
+                    # 带超时的 put：消费端挂掉后队列会一直满，
+                    # 裸 q.put 会永远阻塞，泄漏线程和 fitz 句柄
+                    while not stop.is_set():
+                        try:
+                            q.put(page_doc, timeout=1)
+                            break
+                        except queue.Full:
+                            continue
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # 结束哨兵，同样不能无限阻塞
+            while not stop.is_set():
+                try:
+                    q.put(None, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+
+    producer = threading.Thread(target=_produce, name="pdf-extract", daemon=True)
+    producer.start()
+
+    node_parser = _node_parser
+    embed_model = init_embedding()
+    vector_store = get_vector_store()
+
+    # 重索引前清掉旧向量，配合确定性节点 ID 整个操作保持幂等
+    delete_embeddings_by_titles([doc.title])
+
+    section = ''
+    chunk_index = 0
+    common = _common_metadata(doc)
+
+    def _flush(batch):
+        nonlocal section, chunk_index
+        section = _annotate_sections(batch, section)
+        for llamadoc in batch:
+            llamadoc.metadata.update(common)
+
+        nodes = node_parser.get_nodes_from_documents(batch)
+        for node in nodes:
+            node.id_ = f"{doc.id}:{chunk_index}"
+            chunk_index += 1
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embeddings = embed_model.get_text_embedding_batch(texts)
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        vector_store.add(nodes)
+
+    batch = []
+    try:
+        while True:
+            item = q.get()
+            if item is None:
+                break
+            batch.append(item)
+            if len(batch) >= _STREAM_QUEUE_SIZE:
+                _flush(batch)
+                batch = []
+        if batch:
+            _flush(batch)
+    except Exception:
+        # 嵌入或入库失败：叫停并清空队列放生产线程退出，再把异常往外抛
+        stop.set()
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+        producer.join(timeout=5)
+        raise
+    producer.join()
+
+    if errors:
+        raise errors[0]
+    if chunk_index == 0:
+        raise ValueError("PDF 解析失败：无法提取任何文本内容")
+    return chunk_index
+
+
+# 切分器无状态，全局建一份直接复用。
+# 不再写 LlamaSettings 全局：多线程下改全局会让并发请求互相踩配置。
+# 600/100: 块稍大一点能装下完整段落，100 重叠避免答案恰好跨在块边界上
+_node_parser = SentenceSplitter(chunk_size=600, chunk_overlap=100)
+
+
+def index_documents(document_ids: list) -> int:
+    """
+    批量索引多个文档
+
+    逐个索引时 embedding 模型的 batch 永远填不满 (embed_batch_size=10 却一页页喂)。
+    这里先把所有文档解析完，一次 from_documents 入库，
+    LlamaIndex 内部按批调用 get_text_embedding_batch，吞吐直接乘上批次因子。
+
+    Returns:
+        int: 成功索引的文档数
+    """
+    from documents.models import Document, delete_embeddings_by_titles  # 避免循环导入
+
+    all_documents = []
+    parsed_docs = []
+    skipped = 0
+
+    for document_id in document_ids:
+        try:
+            doc = Document.objects.get(id=document_id)
+
+            unchanged, new_hash = _unchanged_since_last_index(doc)
+            if unchanged:
+                logger.info(f"文档内容未变化，跳过重新索引: {doc.title}")
+                if doc.status != Document.Status.INDEXED:
+                    doc.status = Document.Status.INDEXED
+                    doc.save(update_fields=['status'])
+                skipped += 1
+                continue
+
+            doc.status = Document.Status.PROCESSING
+            doc.save(update_fields=['status'])
+
+            documents = _load_documents(doc)
+            logger.info(f"文档解析完成: {doc.title} ({len(documents)} 页)")
+
+            all_documents.extend(documents)
+            doc.content_sha = new_hash  # 成功后随状态一起落库
+            parsed_docs.append(doc)
+
+        except Exception as e:
+            logger.error(f"文档解析失败 {document_id}: {e}", exc_info=True)
+            Document.objects.filter(id=document_id).update(
+                status=Document.Status.FAILED, error_message=str(e)
+            )
+
+    if not parsed_docs:
+        return skipped
+
+    try:
+        # 先切块再统一嵌入：节点尺寸均匀，embedding 一次批量调用算完，
+        # 带着现成向量调 vector_store.add 时不会再逐节点嵌入
+        nodes = _node_parser.get_nodes_from_documents(all_documents)
+
+        # 确定性节点 ID (document_id:chunk_index)：重索引同一文档生成同一批 ID，
+        # 配合下面的先删后插，重试/重跑不会在向量表里越积越多
+        counters = {}
+        for node in nodes:
+            doc_id = node.metadata.get('document_id')
+            chunk_index = counters.get(doc_id, 0)
+            counters[doc_id] = chunk_index + 1
+            node.id_ = f"{doc_id}:{chunk_index}"
+
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embeddings = init_embedding().get_text_embedding_batch(
+            texts, show_progress=True
+        )
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+
+        # 重索引前清掉这批文档的旧向量，整个操作幂等
+        delete_embeddings_by_titles([d.title for d in parsed_docs])
+
+        vector_store = get_vector_store()
+        vector_store.add(nodes)
+
+        for doc in parsed_docs:
+            doc.status = Document.Status.INDEXED
+            doc.error_message = ''
+            doc.save(update_fields=['status', 'error_message', 'content_sha'])
+
+        invalidate_retriever()
+        logger.info(f"批量索引成功: {len(parsed_docs)} 个文档")
+        return len(parsed_docs) + skipped
+
+    except Exception as e:
+        logger.error(f"批量索引失败: {e}", exc_info=True)
+        for doc in parsed_docs:
+            doc.status = Document.Status.FAILED
+            doc.error_message = str(e)
+            doc.save(update_fields=['status', 'error_message'])
+        return 0
+
+
 def index_document(document_id: int) -> bool:
     """
     索引单个文档
@@ -46,81 +526,58 @@ def index_document(document_id: int) -> bool:
         bool: 是否成功
     """
     from documents.models import Document  # 避免循环导入
-    from llama_index.readers.file import PDFReader
-    
+
     try:
         doc = Document.objects.get(id=document_id)
+
+        unchanged, new_hash = _unchanged_since_last_index(doc)
+        if unchanged:
+            logger.info(f"文档内容未变化，跳过重新索引: {doc.title}")
+            if doc.status != Document.Status.INDEXED:
+                doc.status = Document.Status.INDEXED
+                doc.save(update_fields=['status'])
+            return True
+
         doc.status = Document.Status.PROCESSING
         doc.save(update_fields=['status'])
-        
-        # 获取文件路径
+
+        logger.info(f"开始索引文档: {doc.title}")
+
+        # 解析并写入向量库（超大 PDF 走流式管道，不整本载入内存）
         file_path = Path(settings.MEDIA_ROOT) / str(doc.file)
-        
-        if not file_path.exists():
-            raise FileNotFoundError(f"文件不存在: {file_path}")
-        
-        logger.info(f"开始索引文档: {doc.title} ({file_path})")
-        
-        # 1. 初始化 LLM 和 Embedding
-        llm = init_llm()
-        embed_model = init_embedding()
-        
-        # 配置全局设置
-        LlamaSettings.llm = llm
-        LlamaSettings.embed_model = embed_model
-        LlamaSettings.node_parser = SentenceSplitter(chunk_size=512, chunk_overlap=50)
-        
-        # 2. 读取文档（根据文件类型选择解析器）
-        file_ext = file_path.suffix.lower()
-        
-        if file_ext == '.pdf':
-            # 使用 pdfplumber 解析 PDF（对中文更友好）
-            import pdfplumber
-            from llama_index.core import Document as LlamaDocument
-            
-            documents = []
-            with pdfplumber.open(file_path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text() or ""
-                    if text.strip():
-                        documents.append(LlamaDocument(
-                            text=text,
-                            metadata={"page": i + 1, "source": str(file_path)}
-                        ))
-            
-            if not documents:
-                raise ValueError("PDF 解析失败：无法提取任何文本内容")
+        if file_path.suffix.lower() == '.pdf' and _pdf_page_count(file_path) >= _STREAM_PDF_MIN_PAGES:
+            n_chunks = _index_pdf_streaming(doc, file_path)
+            logger.info(f"流式索引完成: {doc.title} ({n_chunks} 个块)")
         else:
-            # 其他格式使用通用读取器
-            reader = SimpleDirectoryReader(input_files=[str(file_path)])
-            documents = reader.load_data()
-        
-        # 添加元数据
-        for llamadoc in documents:
-            llamadoc.metadata['document_id'] = document_id
-            llamadoc.metadata['title'] = doc.title
-            llamadoc.metadata['file_name'] = doc.file.name if doc.file else doc.title
-        
-        logger.info(f"文档解析完成，共 {len(documents)} 页")
-        
-        # 3. 创建向量存储和索引
-        vector_store = get_vector_store()
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        
-        index = VectorStoreIndex.from_documents(
-            documents,
-            storage_context=storage_context,
-            show_progress=True,
-        )
-        
+            documents = _load_documents(doc)
+
+            logger.info(f"文档解析完成，共 {len(documents)} 页")
+
+            vector_store = get_vector_store()
+            storage_context = StorageContext.from_defaults(vector_store=vector_store)
+
+            VectorStoreIndex.from_documents(
+                documents,
+                storage_context=storage_context,
+                # 显式传入 embedding 和切分器，不依赖 (也不去改) 全局 Settings
+                embed_model=init_embedding(),
+                transformations=[_node_parser],
+                insert_batch_size=2000,  # 大批量提交，减少 PG 往返
+                show_progress=True,
+            )
+
         # 4. 更新状态
         doc.status = Document.Status.INDEXED
         doc.error_message = ''
-        doc.save(update_fields=['status', 'error_message'])
-        
+        doc.content_sha = new_hash
+        doc.save(update_fields=['status', 'error_message', 'content_sha'])
+
+        # 新文档入库后让检索器单例重建
+        invalidate_retriever()
+
         logger.info(f"文档索引成功: {doc.title}")
         return True
-        
+
     except Exception as e:
         logger.error(f"文档索引失败: {e}", exc_info=True)
         try:
@@ -145,24 +602,39 @@ def query_documents(question: str, top_k: int = 3) -> str:
         str: 检索到的相关内容
     """
     try:
-        # 初始化
+        # 第一层：精确匹配，重复问题零计算直接返回
+        exact_key = sha256(question.strip().lower().encode()).hexdigest()
+        with _exact_lock:
+            cached = _exact_cache.get(exact_key)
+        if cached is not None:
+            return cached
+
+        # 初始化 (只拿实例，不碰全局 Settings，并发请求各用各的)
         llm = init_llm()
         embed_model = init_embedding()
-        LlamaSettings.llm = llm
-        LlamaSettings.embed_model = embed_model
-        
-        # 连接向量存储
-        vector_store = get_vector_store()
-        index = VectorStoreIndex.from_vector_store(vector_store)
-        
-        # 创建查询引擎
-        query_engine = index.as_query_engine(similarity_top_k=top_k)
-        
+
+        # 第二层：语义缓存，问题先做 embedding，和历史问题够相似就返回旧答案
+        query_embedding = embed_model.get_query_embedding(question)
+        cached = _query_cache.get(query_embedding)
+        if cached is not None:
+            with _exact_lock:
+                _exact_cache[exact_key] = cached
+            return cached
+
+        # 复用全局向量索引 (连接和 Engine 初始化不在热路径上)
+        index = _get_index()
+
+        # 创建查询引擎 (llm 显式传入)
+        query_engine = index.as_query_engine(llm=llm, similarity_top_k=top_k)
+
         # 执行查询
-        response = query_engine.query(question)
-        
-        return str(response)
-        
+        answer = str(query_engine.query(question))
+        _query_cache.put(query_embedding, answer)
+        with _exact_lock:
+            _exact_cache[exact_key] = answer
+
+        return answer
+
     except Exception as e:
         logger.error(f"知识库查询失败: {e}", exc_info=True)
         return ""
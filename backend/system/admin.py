@@ -2,6 +2,8 @@
 系统配置管理后台
 保留所有功能，优化界面布局
 """
+import asyncio
+
 from django.contrib import admin
 from django.contrib import messages
 from django.utils.html import format_html
@@ -9,6 +11,12 @@ from django.utils.safestring import mark_safe
 from django.utils import timezone
 from .models import LLMConfig, MCPServerConfig, PROVIDER_PRESETS
 
+# 静态模型列表在导入时摊平，刷新动作里省掉两层 dict.get
+_STATIC_MODELS = {
+    provider: preset.get('models', [])
+    for provider, preset in PROVIDER_PRESETS.items()
+}
+
 
 @admin.register(LLMConfig)
 class LLMConfigAdmin(admin.ModelAdmin):
@@ -42,57 +50,67 @@ class LLMConfigAdmin(admin.ModelAdmin):
     
     @admin.action(description="🔄 刷新模型列表")
     def refresh_models(self, request, queryset):
-        """从 API 获取可用模型列表"""
-        import requests
-        
-        for config in queryset:
-            try:
-                models = self._fetch_models(config)
-                config.available_models = models
-                config.last_synced = timezone.now()
-                config.save()
-                
-                models_str = ', '.join(models[:5])
-                if len(models) > 5:
-                    models_str += f' ... (共 {len(models)} 个)'
-                
-                self.message_user(
-                    request,
-                    f"✅ {config.name}: {models_str}",
-                    messages.SUCCESS
-                )
-            except Exception as e:
+        """从 API 获取可用模型列表 (所有服务商并发请求)"""
+        from core.aioloop import run
+
+        configs = list(queryset)
+        # 顺序刷新时每个 10s 超时会串着等；gather 并发后最坏就一个超时周期
+        results = run(asyncio.gather(
+            *[self._afetch_models(config) for config in configs],
+            return_exceptions=True,
+        ))
+
+        updated = []
+        for config, result in zip(configs, results):
+            if isinstance(result, BaseException):
                 self.message_user(
                     request,
-                    f"❌ {config.name}: {e}",
+                    f"❌ {config.name}: {result}",
                     messages.ERROR
                 )
-    
-    def _fetch_models(self, config: LLMConfig) -> list:
+                continue
+
+            config.available_models = result
+            config.last_synced = timezone.now()
+            updated.append(config)
+
+            models_str = ', '.join(result[:5])
+            if len(result) > 5:
+                models_str += f' ... (共 {len(result)} 个)'
+
+            self.message_user(
+                request,
+                f"✅ {config.name}: {models_str}",
+                messages.SUCCESS
+            )
+
+        if updated:
+            # 一条批量 UPDATE 落库，不再逐个 save()
+            LLMConfig.objects.bulk_update(updated, ['available_models', 'last_synced'])
+
+    async def _afetch_models(self, config: LLMConfig) -> list:
         """根据 provider 调用对应的 API 获取模型列表"""
-        import requests
-        
+        import httpx
+
         headers = {"Authorization": f"Bearer {config.api_key}"}
-        
+
         if config.provider == 'deepseek':
-            url = "https://api.deepseek.com/v1/models"
-            resp = requests.get(url, headers=headers, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-            return [m['id'] for m in data.get('data', [])]
-        
+            async with httpx.AsyncClient(timeout=10) as client:
+                resp = await client.get("https://api.deepseek.com/v1/models", headers=headers)
+                resp.raise_for_status()
+                return [m['id'] for m in resp.json().get('data', [])]
+
         elif config.provider == 'openai':
-            url = "https://api.openai.com/v1/models"
-            resp = requests.get(url, headers=headers, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-            all_models = [m['id'] for m in data.get('data', [])]
-            chat_models = [m for m in all_models if any(k in m for k in ['gpt', 'o1', 'o3', 'chatgpt'])]
-            return sorted(chat_models)
-        
+            async with httpx.AsyncClient(timeout=10) as client:
+                resp = await client.get("https://api.openai.com/v1/models", headers=headers)
+                resp.raise_for_status()
+                all_models = [m['id'] for m in resp.json().get('data', [])]
+                chat_models = [m for m in all_models if any(k in m for k in ['gpt', 'o1', 'o3', 'chatgpt'])]
+                return sorted(chat_models)
+
         else:
             # 通义千问、Claude 等使用静态预设
-            return PROVIDER_PRESETS.get(config.provider, {}).get('models', [])
+            return _STATIC_MODELS.get(config.provider, [])
 
 
 @admin.register(MCPServerConfig)
@@ -148,35 +166,53 @@ class MCPServerConfigAdmin(admin.ModelAdmin):
     
     @admin.action(description="🔍 检测连接")
     def test_connection(self, request, queryset):
-        """测试 MCP Server 连接"""
-        for config in queryset:
-            try:
-                tools = self._test_mcp_connection(config)
+        """测试 MCP Server 连接 (所有服务并发探测)"""
+        from core.aioloop import run
+
+        configs = list(queryset)
+        # 串行时一个卡住的 STDIO 进程会拖住后面所有检测；gather 并发后互不影响
+        results = run(asyncio.gather(
+            *[self._atest_mcp_connection(config) for config in configs],
+            return_exceptions=True,
+        ))
+
+        now = timezone.now()
+        for config, result in zip(configs, results):
+            config.last_checked = now
+            # bulk_update 不触发 auto_now，updated_at 要显式推进：
+            # 工具缓存的新鲜度检查比较的是 Max(updated_at)
+            config.updated_at = now
+            if isinstance(result, BaseException):
+                config.status = MCPServerConfig.Status.FAILED
+                config.error_message = str(result)
+                self.message_user(
+                    request,
+                    f"❌ {config.name}: {result}",
+                    messages.ERROR
+                )
+            else:
                 config.status = MCPServerConfig.Status.CONNECTED
-                config.available_tools = tools
+                config.available_tools = result
                 config.error_message = ''
-                config.last_checked = timezone.now()
-                config.save()
                 self.message_user(
-                    request, 
-                    f"✅ {config.name}: 发现 {len(tools)} 个工具",
+                    request,
+                    f"✅ {config.name}: 发现 {len(result)} 个工具",
                     messages.SUCCESS
                 )
-            except Exception as e:
-                config.status = MCPServerConfig.Status.FAILED
-                config.error_message = str(e)
-                config.last_checked = timezone.now()
-                config.save()
-                self.message_user(
-                    request, 
-                    f"❌ {config.name}: {e}",
-                    messages.ERROR
-                )
-    
-    def _test_mcp_connection(self, config: MCPServerConfig) -> list:
-        """测试 MCP 连接"""
+
+        if configs:
+            MCPServerConfig.objects.bulk_update(
+                configs,
+                ['status', 'available_tools', 'error_message', 'last_checked', 'updated_at'],
+            )
+            # bulk_update 也不发 post_save 信号，本进程的脏标记手动置上
+            from core.mcp_tools import invalidate_mcp_tools_cache
+            invalidate_mcp_tools_cache()
+
+    async def _atest_mcp_connection(self, config: MCPServerConfig) -> list:
+        """测试 MCP 连接 (mcp SDK 本身是 asyncio 的，直接走异步接口)"""
         from llama_index.tools.mcp import McpToolSpec, BasicMCPClient
-        
+
         if config.server_type == MCPServerConfig.ServerType.STDIO:
             if not config.command:
                 raise ValueError("STDIO 模式需要填写启动命令")
@@ -193,7 +229,7 @@ class MCPServerConfigAdmin(admin.ModelAdmin):
             client = BasicMCPClient(
                 command_or_url=config.endpoint_url
             )
-        
+
         mcp_tool = McpToolSpec(client=client)
-        tools = mcp_tool.to_tool_list()
+        tools = await mcp_tool.to_tool_list_async()
         return [{'name': t.metadata.name, 'description': t.metadata.description or ''} for t in tools]
@@ -5,3 +5,12 @@ class SystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'system'
     verbose_name = '系统设置'
+
+    def ready(self):
+        # MCP 配置一有增删改就标脏工具缓存，get_mcp_tools 才能在 TTL 内免查库
+        from django.db.models.signals import post_save, post_delete
+        from core.mcp_tools import invalidate_mcp_tools_cache
+        from system.models import MCPServerConfig
+
+        post_save.connect(invalidate_mcp_tools_cache, sender=MCPServerConfig)
+        post_delete.connect(invalidate_mcp_tools_cache, sender=MCPServerConfig)
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('system', '0004_alter_mcpserverconfig_server_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mcpserverconfig',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='更新时间'),
+        ),
+    ]
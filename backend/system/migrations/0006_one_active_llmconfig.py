@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('system', '0005_mcpserverconfig_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='llmconfig',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('is_active', True)),
+                fields=('is_active',),
+                name='one_active_llmconfig',
+            ),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 
 # 预设配置：选择 provider 后自动填充 (2025年1月更新)
@@ -76,6 +76,14 @@ class LLMConfig(models.Model):
         verbose_name = '大模型配置'
         verbose_name_plural = '大模型配置'
         ordering = ['-is_active', '-created_at']
+        constraints = [
+            # 数据库层保证全表最多一条默认配置，并发保存也不会出现双默认
+            models.UniqueConstraint(
+                fields=['is_active'],
+                condition=models.Q(is_active=True),
+                name='one_active_llmconfig',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.get_provider_display()})"
@@ -89,9 +97,20 @@ class LLMConfig(models.Model):
             self.model_name = preset['default_model']
         
         # 保证只有一个配置是 active 的
+        # 锁行 + 事务：两个管理员同时切换默认时，退位和上位要么都生效要么都回滚
         if self.is_active:
-            LLMConfig.objects.filter(is_active=True).exclude(id=self.id).update(is_active=False)
-        super().save(*args, **kwargs)
+            with transaction.atomic():
+                locked_ids = list(
+                    LLMConfig.objects.select_for_update()
+                    .filter(is_active=True)
+                    .exclude(id=self.id)
+                    .values_list('id', flat=True)
+                )
+                if locked_ids:
+                    LLMConfig.objects.filter(id__in=locked_ids).update(is_active=False)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
 
 
 class MCPServerConfig(models.Model):
@@ -165,8 +184,9 @@ class MCPServerConfig(models.Model):
     error_message = models.TextField('错误信息', blank=True)
     
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
-    updated_at = models.DateTimeField('更新时间', auto_now=True)
-    
+    # 建索引：工具缓存的新鲜度检查按 updated_at 取最大值
+    updated_at = models.DateTimeField('更新时间', auto_now=True, db_index=True)
+
     class Meta:
         verbose_name = 'MCP 服务配置'
         verbose_name_plural = 'MCP 服务配置'